@@ -0,0 +1,63 @@
+"""
+Arena benchmark
+
+Builds a 420k node table and compares memory per node and serialization time
+of the VDOM tree against its Arena. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_arena.py
+"""
+import time
+import tracemalloc
+
+from vdom.arena import Arena
+from vdom.helpers import table, td, tr
+
+ROWS = 20000
+CELLS = 10
+
+
+def build():
+    return table(
+        [
+            tr([td(str(i * j), style={'textAlign': 'right'}) for j in range(CELLS)])
+            for i in range(ROWS)
+        ]
+    )
+
+
+def measure(fn):
+    """Run fn, returning its result and the bytes it left allocated"""
+    tracemalloc.start()
+    result = fn()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    tree, tree_bytes = measure(build)
+    arena, arena_bytes = measure(lambda: Arena.from_vdom(tree))
+    nodes = len(arena)
+    flatten = timed(lambda: Arena.from_vdom(tree))
+    print('{} nodes, Arena.from_vdom takes {:.0f} ms'.format(nodes, flatten * 1e3))
+    print('{:<8} {:>10} {:>10} {:>10} {:>10}'.format('', 'B/node', 'to_dict', 'to_json', 'to_html'))
+    for name, obj, allocated in (('VDOM', tree, tree_bytes), ('Arena', arena, arena_bytes)):
+        print(
+            '{:<8} {:>10.0f} {:>8.0f}ms {:>8.0f}ms {:>8.0f}ms'.format(
+                name,
+                allocated / nodes,
+                timed(obj.to_dict) * 1e3,
+                timed(obj.to_json) * 1e3,
+                timed(obj.to_html) * 1e3,
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Node construction benchmark
+
+Builds a 50k node dashboard-like tree through the helpers and through the
+plain ``VDOM`` constructor. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_construction.py
+"""
+import time
+
+from vdom.core import VDOM
+from vdom.helpers import div, span
+
+ROWS = 5000
+CELLS = 9
+
+
+def build_helpers():
+    return div(
+        [
+            div([span(str(i * j), title='cell') for j in range(CELLS)], style={'display': 'flex'})
+            for i in range(ROWS)
+        ]
+    )
+
+
+def build_constructor():
+    return VDOM(
+        'div',
+        children=[
+            VDOM(
+                'div',
+                style={'display': 'flex'},
+                children=[
+                    VDOM('span', {'title': 'cell'}, children=[str(i * j)]) for j in range(CELLS)
+                ],
+            )
+            for i in range(ROWS)
+        ],
+    )
+
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    nodes = 1 + ROWS * (CELLS + 1)
+    cases = [
+        ('create_component', build_helpers),
+        ('VDOM()', build_constructor),
+    ]
+    for name, fn in cases:
+        best = best_of(fn)
+        print('{:<20} {:8.1f} ms  {:6.2f} us/node'.format(name, best * 1e3, best * 1e6 / nodes))
+
+
+if __name__ == '__main__':
+    main()
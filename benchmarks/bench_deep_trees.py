@@ -0,0 +1,53 @@
+"""
+Tree walking benchmark
+
+Converts a 10k deep chain of divs and a ~1M node table to dicts, to HTML and
+back from dicts. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_deep_trees.py
+"""
+import time
+
+from vdom.core import VDOM
+from vdom.helpers import div, p, span
+
+DEPTH = 10000
+ROWS = 10000
+CELLS = 49
+
+
+def deep():
+    el = p('leaf')
+    for _ in range(DEPTH):
+        el = div(el)
+    return el
+
+
+def wide():
+    return div([div([span(str(j)) for j in range(CELLS)]) for i in range(ROWS)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    for name, build, nodes in (
+        ('deep', deep, 2 + DEPTH),
+        ('wide', wide, 1 + ROWS * (1 + 2 * CELLS)),
+    ):
+        el = build()
+        to_dict, value = timed(el.to_dict)
+        to_html, _ = timed(el.to_html)
+        from_dict, _ = timed(lambda: VDOM.from_dict(value))
+        print(
+            '{} ({} nodes)  to_dict {:7.1f} ms  to_html {:7.1f} ms  from_dict {:7.1f} ms'.format(
+                name, nodes, to_dict * 1e3, to_html * 1e3, from_dict * 1e3
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Tree diff benchmark
+
+Diffs pairs of trees that differ in a single place: a wide table with one cell
+changed, a 10k deep chain with a new leaf and two frames of the sparkline-divs
+notebook, and compares that with encoding the new tree in full. Trees are
+built fresh, so every diff pays for hashing them. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_diff.py
+"""
+import time
+
+from vdom import diff
+from vdom.helpers import div, p, table, td, tr
+
+ROWS = 5000
+CELLS = 10
+DEPTH = 10000
+
+
+def wide(changed):
+    return table(
+        [
+            tr([td(str(i * j) if (i, j) != (ROWS // 2, 0) else changed) for j in range(CELLS)])
+            for i in range(ROWS)
+        ]
+    )
+
+
+def deep(leaf):
+    el = p(leaf)
+    for _ in range(DEPTH):
+        el = div(el)
+    return el
+
+
+def sparklines(values):
+    return div(
+        [
+            div(style={'height': '{}px'.format(v * 2), 'display': 'inline-block', 'width': '2px'})
+            for v in values
+        ],
+        style={'display': 'inline-block'},
+    )
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    values = [(i * 7) % 50 for i in range(501)]
+    cases = [
+        ('wide', lambda: wide('old'), lambda: wide('new')),
+        ('deep', lambda: deep('old'), lambda: deep('new')),
+        ('sparklines', lambda: sparklines(values), lambda: sparklines(values[1:] + [25])),
+    ]
+    for name, build_old, build_new in cases:
+        old, new = build_old(), build_new()
+        diff_time, ops = timed(lambda: diff(old, new))
+        encode_time, encoded = timed(new.to_json)
+        print(
+            '{:<11} diff {:7.1f} ms, {} ops  |  to_json {:7.1f} ms, {} chars'.format(
+                name, diff_time * 1e3, len(ops), encode_time * 1e3, len(encoded)
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Display update traffic benchmark
+
+Replays the sparkline-divs notebook's 100 updates of a 500 point sparkline and
+counts the characters sent to the frontend as full display bundles and as
+patches, then as patches sent by an UpdateScheduler at 10 updates a second
+while updates come in every 20 ms. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_display.py
+"""
+import json
+import random
+import time
+
+from vdom import display as vdom_display
+from vdom.display import PatchChannel, UpdateScheduler, VDOMDisplay
+from vdom.helpers import div
+
+UPDATES = 100
+
+
+class CountingComm(object):
+    def __init__(self):
+        self.sent = 0
+
+    def on_msg(self, callback):
+        callback({'content': {'data': {'ready': True}}})
+
+    def on_close(self, callback):
+        pass
+
+    def send(self, data):
+        self.sent += len(json.dumps(data))
+
+
+def dot(value=1, color='black', size=2):
+    return div(
+        style={
+            'height': '{:d}px'.format(value * 2),
+            'display': 'inline-block',
+            'width': '{}px'.format(size),
+            'borderTop': '{}px solid {}'.format(size, color),
+        }
+    )
+
+
+def sparklines(values):
+    dots = [dot(i) for i in values[:-1]]
+    dots.append(dot(values[-1], color='red', size=3))
+    return div(dots, style={'display': 'inline-block'})
+
+
+def replay(channel, scheduler=None, every=0):
+    random.seed(0)
+    events = [25]
+    for _ in range(500):
+        events.append(max(min(events[-1] + random.randint(-2, 2), 50), 0))
+    handle = VDOMDisplay(sparklines(events), channel=channel, scheduler=scheduler)
+    start = time.perf_counter()
+    for _ in range(UPDATES):
+        events.pop(0)
+        events.append(max(min(events[-1] + random.randint(-2, 2), 50), 0))
+        handle.update(sparklines(events))
+        if every:
+            time.sleep(every)
+    if scheduler is not None:
+        scheduler.close()
+    return time.perf_counter() - start
+
+
+def main():
+    sent = [0]
+
+    def send_bundle(tree, display_id):
+        sent[0] += len(json.dumps(tree._repr_mimebundle_()))
+
+    vdom_display.display = vdom_display.update_display = send_bundle
+    elapsed = replay(None)
+    print('full bundles  {:8.1f} ms  {:9} chars'.format(elapsed * 1e3, sent[0]))
+
+    comm = CountingComm()
+    elapsed = replay(PatchChannel(comm))
+    print('patches       {:8.1f} ms  {:9} chars'.format(elapsed * 1e3, comm.sent))
+
+    comm = CountingComm()
+    elapsed = replay(PatchChannel(comm), UpdateScheduler(max_frequency=10), every=0.02)
+    print('scheduled     {:8.1f} ms  {:9} chars'.format(elapsed * 1e3, comm.sent))
+
+
+if __name__ == '__main__':
+    main()
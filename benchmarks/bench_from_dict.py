@@ -0,0 +1,49 @@
+"""
+VDOM.from_dict benchmark
+
+Builds trees from dicts that double in depth (a chain of nested divs) and in
+width (a table with more and more rows), to show how the cost grows. Run from
+the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_from_dict.py
+"""
+import time
+
+from vdom.core import VDOM
+
+
+def deep(depth):
+    value = {'tagName': 'p', 'attributes': {}, 'children': ['leaf']}
+    for _ in range(depth):
+        value = {'tagName': 'div', 'attributes': {}, 'children': [value]}
+    return value
+
+
+def wide(rows):
+    cell = {'tagName': 'td', 'attributes': {'title': 'x'}, 'children': ['1']}
+    row = {'tagName': 'tr', 'attributes': {}, 'children': [cell] * 10}
+    return {'tagName': 'table', 'attributes': {}, 'children': [row] * rows}
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    for name, make, sizes in (('deep', deep, [25, 50, 100]), ('wide', wide, [250, 500, 1000])):
+        for size in sizes:
+            value = make(size)
+            print(
+                '{} {:>5}  validated {:8.1f} ms  unvalidated {:8.1f} ms'.format(
+                    name,
+                    size,
+                    timed(lambda: VDOM.from_dict(value)) * 1e3,
+                    timed(lambda: VDOM.from_dict(value, validate=False)) * 1e3,
+                )
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+FrozenDict memory and latency benchmark
+
+Compares the OrderedDict based FrozenDict vdom used to ship with the current
+one, then measures what a 100k node tree costs per node. Run from the
+repository root:
+
+    PYTHONPATH=. python benchmarks/bench_frozendict.py
+"""
+import time
+import tracemalloc
+from collections import OrderedDict
+
+from vdom.frozendict import FrozenDict
+from vdom.helpers import div, span
+
+NODES = 100000
+
+
+class LegacyFrozenDict(OrderedDict):
+    def __init__(self, *args, **kwargs):
+        self.frozen = False
+        super(LegacyFrozenDict, self).__init__(*args, **kwargs)
+        self.frozen = True
+
+    def __readonly__(self, func, *args, **kwargs):
+        if self.frozen:
+            raise ValueError("Can not modify FrozenDict")
+        else:
+            return func(*args, **kwargs)
+
+    def __setitem__(self, *args, **kwargs):
+        return self.__readonly__(super(LegacyFrozenDict, self).__setitem__, *args, **kwargs)
+
+
+def allocated(fn):
+    """Bytes still allocated by the result of fn"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def per_call(fn, number=100000):
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+
+def main():
+    items = [('class', 'cell'), ('title', 'x')]
+    for cls in (LegacyFrozenDict, FrozenDict):
+        empty = allocated(lambda: [cls() for _ in range(NODES)]) / NODES
+        small = allocated(lambda: [cls(items) for _ in range(NODES)]) / NODES
+        latency = per_call(lambda: cls(items))
+        print(
+            '{:<18} empty {:6.0f} B  2 items {:6.0f} B  construct {:5.2f} us'.format(
+                cls.__name__, empty, small, latency * 1e6
+            )
+        )
+
+    rows = NODES // 10
+    tree = allocated(
+        lambda: div([div([span(str(j), title='x') for j in range(9)]) for i in range(rows)])
+    )
+    print('{:<18} {:6.0f} B/node'.format('tree', tree / NODES))
+
+
+if __name__ == '__main__':
+    main()
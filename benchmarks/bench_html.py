@@ -0,0 +1,51 @@
+"""
+HTML rendering benchmark
+
+Renders a ~1M node table and a 10k deep chain of divs with ``to_html``. Trees
+cache their HTML, so each run renders a freshly built tree. Run from the
+repository root:
+
+    PYTHONPATH=. python benchmarks/bench_html.py
+"""
+import time
+
+from vdom.helpers import div, p, span
+
+ROWS = 10000
+CELLS = 49
+DEPTH = 10000
+
+
+def table():
+    return div(
+        [
+            div([span(str(j), title='cell') for j in range(CELLS)], style={'display': 'flex'})
+            for i in range(ROWS)
+        ]
+    )
+
+
+def chain():
+    el = p('leaf')
+    for _ in range(DEPTH):
+        el = div(el)
+    return el
+
+
+def best_of(build, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        el = build()
+        start = time.perf_counter()
+        el.to_html()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    for name, build in (('table', table), ('chain', chain)):
+        print('{:<8} {:8.1f} ms'.format(name, best_of(build) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
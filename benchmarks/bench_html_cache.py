@@ -0,0 +1,42 @@
+"""
+HTML fragment cache benchmark
+
+Renders a 5000 row table, then a copy of it with one row replaced, which
+shares every other row with the first table. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_html_cache.py
+"""
+import time
+
+from vdom.helpers import table, td, tr
+
+ROWS = 5000
+CELLS = 10
+
+
+def row(i):
+    return tr([td(str(i * j), style={'textAlign': 'right'}) for j in range(CELLS)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    rows = [row(i) for i in range(ROWS)]
+    first = table(rows)
+    second = table(rows[:-1] + [row(-1)])
+    cases = [
+        ('to_html, cold', first.to_html),
+        ('to_html, cached', first.to_html),
+        ('to_html, one row new', second.to_html),
+        ('iter_html, one row new', lambda: ''.join(second.iter_html())),
+    ]
+    for name, fn in cases:
+        print('{:<24} {:8.2f} ms'.format(name, timed(fn) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+JSON fragment cache benchmark
+
+Encodes a 5000 row table, then a copy of it with one row replaced, which
+shares every other row with the first table. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_json_cache.py
+"""
+import json
+import time
+
+from vdom.helpers import table, td, tr
+
+ROWS = 5000
+CELLS = 10
+
+
+def row(i):
+    return tr([td(str(i * j), style={'textAlign': 'right'}) for j in range(CELLS)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    rows = [row(i) for i in range(ROWS)]
+    first = table(rows)
+    second = table(rows[:-1] + [row(-1)])
+    cases = [
+        ('json.dumps(to_dict())', lambda: json.dumps(first.to_dict())),
+        ('to_json, cold', first.to_json),
+        ('to_json, cached', first.to_json),
+        ('to_json, one row new', second.to_json),
+    ]
+    for name, fn in cases:
+        print('{:<24} {:8.2f} ms'.format(name, timed(fn) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
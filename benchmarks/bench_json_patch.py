@@ -0,0 +1,49 @@
+"""
+JSON Patch benchmark
+
+Compares shipping a 5000 row table in full with shipping a JSON Patch after
+ten of its rows change, and times applying the patch on the receiving end.
+Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_json_patch.py
+"""
+import json
+import time
+
+from vdom import apply_patch, make_patch
+from vdom.core import VDOM
+from vdom.helpers import td
+
+ROWS = 5000
+CELLS = 10
+
+
+def row(i, label='value'):
+    return VDOM('tr', key=i, children=[td('{} {}'.format(label, i * j)) for j in range(CELLS)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    rows = [row(i) for i in range(ROWS)]
+    old = VDOM('tbody', children=rows)
+    changed = rows[:]
+    for i in range(0, ROWS, ROWS // 10):
+        changed[i] = row(i, 'changed')
+    new = VDOM('tbody', children=changed)
+
+    full_time, full = timed(new.to_json)
+    patch_time, patch = timed(lambda: json.dumps(make_patch(old, new)))
+    apply_time, patched = timed(lambda: apply_patch(old, json.loads(patch)))
+    assert patched == new
+    print('full document  {:8.1f} ms  {:9} chars'.format(full_time * 1e3, len(full)))
+    print('JSON Patch     {:8.1f} ms  {:9} chars'.format(patch_time * 1e3, len(patch)))
+    print('apply_patch    {:8.1f} ms'.format(apply_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Display bundle benchmark
+
+Formats freshly built 20k row tables with IPython's display formatter, as the
+notebook does on every display, within the default display budget and without
+one.
+Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_mimebundle.py
+"""
+import time
+
+from IPython.core.formatters import DisplayFormatter
+
+from vdom.core import VDOM
+from vdom.helpers import table, td, tr
+
+ROWS = 20000
+CELLS = 10
+
+
+def build():
+    return table(
+        [
+            tr([td(str(i * j), style={'textAlign': 'right'}) for j in range(CELLS)])
+            for i in range(ROWS)
+        ]
+    )
+
+
+def timed(build, **kwargs):
+    el = build()
+    start = time.perf_counter()
+    DisplayFormatter().format(el, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    cases = [
+        ('default', {}),
+        ('VDOM JSON only', {'include': ['application/vdom.v1+json']}),
+        ('text/plain only', {'include': ['text/plain']}),
+        ('with text/html', {'include': ['application/vdom.v1+json', 'text/html']}),
+    ]
+    for name, kwargs in cases:
+        print('{:<16} {:8.1f} ms'.format(name, timed(build, **kwargs) * 1e3))
+    VDOM.display_max_nodes = VDOM.display_max_bytes = None
+    print('{:<16} {:8.1f} ms'.format('no budget', timed(build) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
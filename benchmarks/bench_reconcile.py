@@ -0,0 +1,55 @@
+"""
+Keyed reconciliation benchmark
+
+Diffs a list of 5000 keyed rows against the same rows sorted, filtered or
+shuffled, then a list of 50000 against itself reversed, and reports how long
+that takes and how many rows had to move. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_reconcile.py
+"""
+import random
+import time
+
+from vdom import diff
+from vdom.core import VDOM
+from vdom.diffing import Move
+from vdom.helpers import td
+
+ROWS = 5000
+LARGE_ROWS = 50000
+
+
+def rows(keys):
+    return VDOM(
+        'tbody', children=[VDOM('tr', key=k, children=[td(str(k)), td('row')]) for k in keys]
+    )
+
+
+def main():
+    rng = random.Random(0)
+    keys = list(range(ROWS))
+    shuffled = keys[:]
+    rng.shuffle(shuffled)
+    one_moved = keys[1:2500] + [0] + keys[2500:]
+    cases = [
+        ('one row moved', one_moved),
+        ('reversed', keys[::-1]),
+        ('every other row', keys[::2]),
+        ('shuffled', shuffled),
+    ]
+    large_keys = list(range(LARGE_ROWS))
+    runs = [(rows(keys), name, new_keys) for name, new_keys in cases]
+    runs.append((rows(large_keys), 'large reversed', large_keys[::-1]))
+    for old, name, new_keys in runs:
+        new = rows(new_keys)
+        start = time.perf_counter()
+        ops = diff(old, new)
+        elapsed = time.perf_counter() - start
+        moves = sum(1 for op in ops if type(op) is Move)
+        print(
+            '{:<16} {:8.1f} ms  {:5} ops  {:5} moves'.format(name, elapsed * 1e3, len(ops), moves)
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Style-heavy HTML rendering benchmark
+
+Renders the trees of the sparkline-divs example notebook: a few hundred
+inline-block divs, each with four style properties. Run from the repository
+root:
+
+    PYTHONPATH=. python benchmarks/bench_sparklines.py
+"""
+import random
+import time
+
+from vdom.helpers import div
+
+POINTS = 500
+FRAMES = 100
+
+
+def dot(value=1, color='black', size=2):
+    return div(
+        style={
+            'height': '{:d}px'.format(value * 2),
+            'display': 'inline-block',
+            'width': '{}px'.format(size),
+            'borderTop': '{}px solid {}'.format(size, color),
+        }
+    )
+
+
+def sparklines(events):
+    dots = [dot(i) for i in events[:-1]]
+    dots.append(dot(events[-1], color='red', size=3))
+    return div(dots, style={'display': 'inline-block'})
+
+
+def main():
+    random.seed(0)
+    events = [25]
+    for _ in range(POINTS):
+        events.append(max(min(events[-1] + random.randint(-2, 2), 50), 0))
+    frames = [sparklines(events[i:] + events[:i]) for i in range(FRAMES)]
+
+    start = time.perf_counter()
+    for frame in frames:
+        frame.to_html()
+    elapsed = time.perf_counter() - start
+    print(
+        '{} frames  {:8.1f} ms  {:6.0f} us/frame'.format(
+            FRAMES, elapsed * 1e3, elapsed * 1e6 / FRAMES
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Streaming serialization benchmark
+
+Writes a 420k node table to a file, once by building the whole document in
+memory first and once by streaming it, and reports time and peak memory. Run
+from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_streaming.py
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from vdom.helpers import table, td, tr
+
+ROWS = 20000
+CELLS = 10
+
+
+def build():
+    return table(
+        [
+            tr([td(str(i * j), style={'textAlign': 'right'}) for j in range(CELLS)])
+            for i in range(ROWS)
+        ]
+    )
+
+
+def measure(fn):
+    """Time fn, then run it again to find the peak memory it allocated"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    tree = build()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'out')
+
+        def write_whole(render):
+            with open(path, 'w') as f:
+                f.write(render())
+
+        def write_streamed(render_to):
+            with open(path, 'w') as f:
+                render_to(f)
+
+        cases = [
+            ('to_json', lambda: write_whole(tree.to_json)),
+            ('render_json_to', lambda: write_streamed(tree.render_json_to)),
+            ('to_html', lambda: write_whole(tree.to_html)),
+            ('render_html_to', lambda: write_streamed(tree.render_html_to)),
+        ]
+        for name, fn in cases:
+            elapsed, peak = measure(fn)
+            print('{:<16} {:8.0f} ms  peak {:8.1f} MB'.format(name, elapsed * 1e3, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Template benchmark
+
+Renders the happiness component from docs/design-patterns.md to JSON and HTML,
+built element by element and through a compiled template. Run from the
+repository root:
+
+    PYTHONPATH=. python benchmarks/bench_template.py
+"""
+import time
+
+from vdom.helpers import meter, p, span
+from vdom.template import template
+
+RENDERS = 20000
+
+
+def happiness(level, smiley):
+    return span(
+        p('Happiness ', smiley),
+        meter(str(level), min=0, low=25, high=75, optimum=90, max=100, value=level),
+    )
+
+
+happiness_template = template(happiness)
+
+
+def per_render(fn):
+    start = time.perf_counter()
+    for level in range(RENDERS):
+        fn(level % 100)
+    return (time.perf_counter() - start) / RENDERS
+
+
+def main():
+    cases = [
+        ('component to_json', lambda level: happiness(level, '😃').to_json()),
+        ('template to_json', lambda level: happiness_template(level, '😃').to_json()),
+        ('component to_html', lambda level: happiness(level, '😃').to_html()),
+        ('template to_html', lambda level: happiness_template(level, '😃').to_html()),
+    ]
+    for name, fn in cases:
+        print('{:<20} {:6.2f} us/render'.format(name, per_render(fn) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Schema validation benchmark
+
+Validates many small VDOM payloads, the way a service ingesting them from
+clients would. Run from the repository root:
+
+    PYTHONPATH=. python benchmarks/bench_validation.py
+"""
+import time
+
+from vdom.core import VDOM, VDOM_SCHEMA, to_json
+from vdom.helpers import div, li, ul
+
+PAYLOADS = 2000
+
+
+def payload(i):
+    return {
+        'tagName': 'div',
+        'attributes': {'id': 'card-{}'.format(i)},
+        'children': [
+            {'tagName': 'h2', 'attributes': {}, 'children': ['Card {}'.format(i)]},
+            {'tagName': 'p', 'attributes': {'style': {'color': 'red'}}, 'children': ['body']},
+        ],
+    }
+
+
+def main():
+    payloads = [payload(i) for i in range(PAYLOADS)]
+    elements = [div(ul(li(str(i)), li('two'))) for i in range(PAYLOADS)]
+    cases = [
+        ('VDOM.from_dict', lambda: [VDOM.from_dict(p) for p in payloads]),
+        ('VDOM.validate', lambda: [el.validate(VDOM_SCHEMA) for el in elements]),
+        ('to_json(schema)', lambda: [to_json(p, VDOM_SCHEMA) for p in payloads]),
+    ]
+    for name, fn in cases:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(
+            '{:<16} {:8.1f} ms  {:6.1f} us/payload'.format(
+                name, elapsed * 1e3, elapsed * 1e6 / PAYLOADS
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
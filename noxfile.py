@@ -1,7 +1,7 @@
 import nox
 import nox_poetry
 
-LINT_PATHS = ["vdom", "noxfile.py"]
+LINT_PATHS = ["vdom", "benchmarks", "noxfile.py"]
 
 nox.options.reuse_existing_virtualenv = True
 nox.options.sessions = ["lint", "test"]
@@ -1,6 +1,8 @@
 from ._version import get_versions
 from .core import *
+from .diffing import apply_diff, diff, reconcile
 from .helpers import *
+from .json_patch import apply_patch, make_patch
 
 __version__ = get_versions()['version']
 del get_versions
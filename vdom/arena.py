@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+vdom.arena
+~~~~~~~~~~
+
+A columnar representation for very large VDOM trees.
+
+from vdom.arena import Arena
+
+arena = Arena.from_vdom(table_of_a_million_cells)
+arena.to_html()
+
+"""
+import json
+from array import array
+
+from .core import VDOM, _element_dict, _escape, _start_tag
+from .frozendict import FrozenDict
+
+# Record shared by every element without attributes, style, event handlers or key
+_BARE = (FrozenDict(), FrozenDict(), FrozenDict(), None)
+
+
+class Arena(object):
+    """A VDOM tree flattened into parallel arrays, in document (pre-)order
+
+    For the node at index ``i``:
+
+    - ``tags[i]`` indexes ``tag_names``, or is -1 for a text node
+    - ``parents[i]`` is the index of its parent, -1 for the root
+    - ``ends[i]`` is one past the index of the last node in its subtree, so its
+      children are ``i + 1``, then ``ends[i + 1]``, and so on up to ``ends[i]``
+    - ``refs[i]`` indexes ``records`` (attributes, style, event handlers, key)
+      for an element, or ``texts`` for a text node
+
+    Tag names, texts and records are deduplicated, so a large table costs a
+    few machine integers per cell rather than a Python object graph. Arenas
+    are meant to be built once and rendered, not edited.
+    """
+
+    __slots__ = ['tags', 'parents', 'ends', 'refs', 'tag_names', 'texts', 'records']
+
+    def __init__(self, tags, parents, ends, refs, tag_names, texts, records):
+        self.tags = tags
+        self.parents = parents
+        self.ends = ends
+        self.refs = refs
+        self.tag_names = tag_names
+        self.texts = texts
+        self.records = records
+
+    def __len__(self):
+        return len(self.tags)
+
+    @classmethod
+    def from_vdom(cls, root):
+        """Flatten a VDOM tree into an Arena"""
+        tags = array('i')
+        parents = array('i')
+        refs = array('i')
+        tag_names = []
+        tag_ids = {}
+        texts = []
+        text_ids = {}
+        records = [_BARE]
+        record_ids = {}
+
+        stack = [(root, -1)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(tags)
+            parents.append(parent)
+            if isinstance(node, VDOM):
+                tag_id = tag_ids.get(node.tag_name)
+                if tag_id is None:
+                    tag_id = tag_ids[node.tag_name] = len(tag_names)
+                    tag_names.append(node.tag_name)
+                tags.append(tag_id)
+                refs.append(_record_id(node, records, record_ids))
+                stack.extend((c, index) for c in reversed(node.children))
+            else:
+                text_id = text_ids.get(node)
+                if text_id is None:
+                    text_id = text_ids[node] = len(texts)
+                    texts.append(node)
+                tags.append(-1)
+                refs.append(text_id)
+
+        # Every subtree ends where its last descendant does; walking backwards
+        # means children are always settled before their parents
+        ends = array('i', range(1, len(tags) + 1))
+        for index in range(len(tags) - 1, 0, -1):
+            parent = parents[index]
+            if ends[index] > ends[parent]:
+                ends[parent] = ends[index]
+        return cls(tags, parents, ends, refs, tag_names, texts, records)
+
+    def _children(self, index):
+        ends = self.ends
+        child = index + 1
+        end = ends[index]
+        while child < end:
+            yield child
+            child = ends[child]
+
+    def _build(self, element, text):
+        """Build every node bottom up, returning the root
+
+        ``element(index, record_id, children)`` and ``text(value)`` produce the
+        output for one node, given its already built children.
+        """
+        tags, parents, refs, texts = self.tags, self.parents, self.refs, self.texts
+        # Walking backwards, each node sees its children last to first
+        children_of = [None] * len(tags)
+        built = None
+        for index in range(len(tags) - 1, -1, -1):
+            if tags[index] < 0:
+                built = text(texts[refs[index]])
+            else:
+                children = children_of[index]
+                if children is None:
+                    children = []
+                else:
+                    children.reverse()
+                    children_of[index] = None
+                built = element(index, refs[index], children)
+            parent = parents[index]
+            if parent >= 0:
+                if children_of[parent] is None:
+                    children_of[parent] = [built]
+                else:
+                    children_of[parent].append(built)
+        return built
+
+    def _walk(self, open_element, close_element, text, separator=''):
+        """Emit output parts in document order with a single pass over the arrays
+
+        ``open_element(tag_id, record_id)``, ``close_element(tag_id)`` and
+        ``text(text_id)`` return the part for one node; ``separator`` goes
+        between siblings.
+        """
+        tags, ends, refs = self.tags, self.ends, self.refs
+        out = []
+        # Elements still waiting to be closed, as [end, tag id, has children]
+        open_elements = []
+        for index in range(len(tags)):
+            while open_elements and open_elements[-1][0] <= index:
+                out.append(close_element(open_elements.pop()[1]))
+            if open_elements:
+                parent = open_elements[-1]
+                if parent[2] and separator:
+                    out.append(separator)
+                parent[2] = True
+            tag_id = tags[index]
+            if tag_id < 0:
+                out.append(text(refs[index]))
+            else:
+                out.append(open_element(tag_id, refs[index]))
+                open_elements.append([ends[index], tag_id, False])
+        while open_elements:
+            out.append(close_element(open_elements.pop()[1]))
+        return ''.join(out)
+
+    def to_vdom(self):
+        """Convert back to a tree of VDOM objects"""
+        tag_names, tags, records = self.tag_names, self.tags, self.records
+
+        def element(index, record_id, children):
+            attributes, style, event_handlers, key = records[record_id]
+            return VDOM._trusted(
+                tag_names[tags[index]], attributes, style, tuple(children), key, event_handlers
+            )
+
+        return self._build(element, lambda value: value)
+
+    def to_dict(self):
+        """Converts the tree to a dictionary that passes our schema"""
+        if self._has_event_handlers():
+            return self.to_vdom().to_dict()
+        tag_names, tags, records = self.tag_names, self.tags, self.records
+        templates = {}
+
+        def element(index, record_id, children):
+            template = templates.get((tags[index], record_id))
+            if template is None:
+                attributes, style, event_handlers, key = records[record_id]
+                template = _element_dict(
+                    tag_names[tags[index]], attributes, style, event_handlers, key, None
+                )
+                templates[tags[index], record_id] = template
+            vdom_dict = template.copy()
+            # Give every element its own attributes, the only nested dict callers tend to edit
+            attributes = vdom_dict['attributes'] = template['attributes'].copy()
+            if 'style' in attributes:
+                attributes['style'] = attributes['style'].copy()
+            vdom_dict['children'] = children
+            return vdom_dict
+
+        return self._build(element, lambda value: value)
+
+    def to_json(self):
+        """
+        Return the same JSON as ``json.dumps(arena.to_dict())``, encoding each
+        distinct tag and record only once
+        """
+        if self._has_event_handlers():
+            return self.to_vdom().to_json()
+        tag_names, texts, records = self.tag_names, self.texts, self.records
+        prefixes = {}
+
+        def open_element(tag_id, record_id):
+            prefix = prefixes.get((tag_id, record_id))
+            if prefix is None:
+                attributes, style, event_handlers, key = records[record_id]
+                empty = _element_dict(tag_names[tag_id], attributes, style, event_handlers, key, [])
+                # Everything up to and including the opening bracket of children
+                prefix = prefixes[tag_id, record_id] = json.dumps(empty)[:-2]
+            return prefix
+
+        return self._walk(
+            open_element,
+            lambda tag_id: ']}',
+            lambda text_id: json.dumps(texts[text_id]),
+            separator=', ',
+        )
+
+    def _has_event_handlers(self):
+        # Handler ids depend on where elements are, so records can't be encoded once for all
+        return any(record[2] for record in self.records)
+
+    def to_html(self):
+        """
+        Return HTML representation of the tree, identical to ``VDOM.to_html``,
+        rendering each distinct start tag, end tag and text only once
+        """
+        tag_names, texts, records = self.tag_names, self.texts, self.records
+        start_tags = {}
+        end_tags = {}
+        escaped = {}
+
+        def open_element(tag_id, record_id):
+            start_tag = start_tags.get((tag_id, record_id))
+            if start_tag is None:
+                attributes, style, _, _ = records[record_id]
+                start_tag = _start_tag(tag_names[tag_id], attributes, style)
+                start_tags[tag_id, record_id] = start_tag
+            return start_tag
+
+        def close_element(tag_id):
+            end_tag = end_tags.get(tag_id)
+            if end_tag is None:
+                end_tag = end_tags[tag_id] = '</{tag}>'.format(tag=_escape(tag_names[tag_id]))
+            return end_tag
+
+        def text(text_id):
+            value = escaped.get(text_id)
+            if value is None:
+                value = escaped[text_id] = _escape(str(texts[text_id]))
+            return value
+
+        return self._walk(open_element, close_element, text)
+
+
+def _record_id(node, records, record_ids):
+    """Find or add the (attributes, style, event handlers, key) record of an element"""
+    if not (node.attributes or node.style or node.event_handlers or node.key is not None):
+        return 0
+    record = (node.attributes, node.style, node.event_handlers, node.key)
+    try:
+        # With the types of values, which render differently even when equal (True, 1, 1.0)
+        lookup = (
+            tuple(node.attributes.items()),
+            tuple(map(type, node.attributes.values())),
+            tuple(node.style.items()),
+            tuple(node.event_handlers.items()),
+            node.key,
+            type(node.key),
+        )
+        record_id = record_ids.get(lookup)
+    except TypeError:
+        # Unhashable attribute values, keep this record to itself
+        records.append(record)
+        return len(records) - 1
+    if record_id is None:
+        record_id = record_ids[lookup] = len(records)
+        records.append(record)
+    return record_id
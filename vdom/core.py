@@ -8,22 +8,698 @@ that are renderable in jupyter frontends.
 """
 from __future__ import unicode_literals
 
+import contextlib
+import functools
+import hashlib
 import io
 import json
+import numbers
 import os
 import re
+import threading
 import warnings
+import weakref
 from html import escape
 
 from IPython import get_ipython
-from jsonschema import Draft4Validator, ValidationError, validate
+from jsonschema import Draft4Validator, ValidationError
+from jsonschema.exceptions import best_match
 
 from vdom.frozendict import FrozenDict
 
 _vdom_schema_file_path = os.path.join(os.path.dirname(__file__), "schemas", "vdom_schema_v1.json")
 with io.open(_vdom_schema_file_path, "r") as f:
     VDOM_SCHEMA = json.load(f)
+# Pristine copy of the schema that _is_vdom_element checks by hand
+with io.open(_vdom_schema_file_path, "r") as f:
+    _VDOM_SCHEMA_V1 = json.load(f)
 _validate_err_template = "Your object didn't match the schema: {}. \n {}"
+# Default size, in characters, of the chunks streamed by iter_json and friends
+_CHUNK_SIZE = 65536
+# Elements whose encoding takes at least this many pieces keep their JSON or HTML fragment
+_FRAGMENT_MIN_PARTS = 32
+# Characters html.escape replaces
+_ESCAPED_CHARS = re.compile('[&<>"\']')
+# Most converted style keys cached by convert_style_key
+_STYLE_KEYS_MAXSIZE = 1024
+# Most event handlers the handler registry keeps, the ones serialized least recently going first
+_HANDLERS_MAXSIZE = 65536
+# Most compiled schema validators kept around at once
+_VALIDATORS_MAXSIZE = 64
+
+# Shared by every node without attributes, style or event handlers
+_EMPTY_FROZENDICT = FrozenDict()
+_object_setattr = object.__setattr__
+
+
+def _freeze(mapping):
+    """Sort a mapping into a FrozenDict so our outputs are predictable"""
+    if not mapping:
+        return _EMPTY_FROZENDICT
+    return FrozenDict(sorted(mapping.items()))
+
+
+def _check_children(children):
+    """Validate that all children are VDOMs or strings"""
+    for c in children:
+        if not isinstance(c, (VDOM, str, bytes)):
+            raise ValueError('Children must be a list of VDOM objects or strings')
+
+
+def _check_style(style):
+    """All style keys & values must be strings"""
+    for k, v in style.items():
+        if not (isinstance(k, (str, bytes)) and isinstance(v, (str, bytes))):
+            raise ValueError('Style must be a dict with string keys & values')
+
+
+def _init_slots(node, tag_name, attributes, style, children, key, event_handlers):
+    """Fill in the slots of a new VDOM, bypassing the immutability guard"""
+    _object_setattr(node, 'tag_name', tag_name)
+    _object_setattr(node, 'attributes', attributes)
+    _object_setattr(node, 'style', style)
+    _object_setattr(node, 'children', children)
+    _object_setattr(node, 'key', key)
+    _object_setattr(node, 'event_handlers', event_handlers)
+    _object_setattr(node, '_hash', None)
+    _object_setattr(node, '_has_handlers', None)
+    _object_setattr(node, '_json', None)
+    _object_setattr(node, '_html', None)
+    # mark completion of object creation. Object is immutable from now.
+    _object_setattr(node, '_frozen', True)
+
+
+def _hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _values_hash(mapping):
+    """Hash attribute values along with their types
+
+    True, 1 and 1.0 are equal but don't render the same. Unhashable values,
+    such as dicts and lists, are only hashed by their type, and told apart by
+    equality.
+    """
+    if not mapping:
+        return 0
+    try:
+        return hash((tuple(mapping.items()), tuple(map(type, mapping.values()))))
+    except TypeError:
+        return hash(tuple((k, type(v), v if _hashable(v) else None) for k, v in mapping.items()))
+
+
+def _same_values(a, b):
+    """Compare attribute mappings, telling True, 1 and 1.0 apart"""
+    if a is b:
+        return True
+    if a != b:
+        return False
+    return all(type(v) is type(b[k]) for k, v in a.items())
+
+
+def _node_hash(node):
+    """Hash a node whose VDOM children have all been hashed already"""
+    return hash(
+        (
+            node.tag_name,
+            _values_hash(node.attributes),
+            tuple(node.style.items()),
+            node.key,
+            type(node.key),
+            tuple(c._hash if isinstance(c, VDOM) else c for c in node.children),
+        )
+    )
+
+
+def _structural_hash(root):
+    """Compute and cache the Merkle-style hash of every unhashed node below root
+
+    Whether each node has event handlers in its subtree is cached along the
+    way. Walks the tree with an explicit stack so deep trees can't overflow
+    the interpreter stack.
+    """
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        pending = [c for c in node.children if isinstance(c, VDOM) and c._hash is None]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        if node._hash is None:
+            has_handlers = bool(node.event_handlers) or any(
+                c._has_handlers for c in node.children if isinstance(c, VDOM)
+            )
+            _object_setattr(node, '_has_handlers', has_handlers)
+            _object_setattr(node, '_hash', _node_hash(node))
+    return root._hash
+
+
+def _subtree_has_handlers(node):
+    """Whether node or any element below it has event handlers, cached with the hash"""
+    if node._hash is None:
+        _structural_hash(node)
+    return node._has_handlers
+
+
+def _convert_tree(root, is_element, children_of, leaf, element):
+    """Convert a tree bottom up, walking it with an explicit stack
+
+    ``element(node, converted_children)`` converts a node whose children have
+    all been converted, ``leaf(child)`` a child that isn't an element. Depth
+    is only bounded by memory.
+    """
+    # One entry per open element: the element, its remaining children and the converted ones
+    stack = [(root, iter(children_of(root)), [])]
+    while True:
+        node, children, converted = stack[-1]
+        for child in children:
+            if is_element(child):
+                stack.append((child, iter(children_of(child)), []))
+                break
+            converted.append(leaf(child))
+        else:
+            stack.pop()
+            result = element(node, converted)
+            if not stack:
+                return result
+            stack[-1][2].append(result)
+
+
+def _segment(index, child):
+    """Where a child element is among its siblings: by key if it has one, so reordering keeps it"""
+    return index if child.key is None else ('key', child.key)
+
+
+def _root_path(root):
+    """The path of a displayed root: its key if it has one, so separate displays keep apart"""
+    return () if root.key is None else (('key', root.key),)
+
+
+def _stack_path(path, stack, index_at, node_at, index, child):
+    """The path of child, at index in the element on top of the stack of a walk from path
+
+    Every frame but the root's keeps the index of its element at index_at and
+    the element itself at node_at.
+    """
+    segments = [_segment(frame[index_at], frame[node_at]) for frame in stack[1:]]
+    return path + tuple(segments) + (_segment(index, child),)
+
+
+def _is_dict(value):
+    return isinstance(value, dict)
+
+
+def _dict_children(value):
+    return value.get('children') or ()
+
+
+def _check_text(child):
+    if not isinstance(child, str):
+        raise ValueError('Children must be a list of VDOM objects or strings')
+    return child
+
+
+def _structurally_equal(a, b):
+    """Compare two trees, skipping any pair of subtrees whose hashes already disagree"""
+    pairs = [(a, b)]
+    while pairs:
+        a, b = pairs.pop()
+        if a is b:
+            continue
+        if hash(a) != hash(b):
+            return False
+        if (a.tag_name, a.key, len(a.children)) != (b.tag_name, b.key, len(b.children)):
+            return False
+        if type(a.key) is not type(b.key):
+            return False
+        if not _same_values(a.attributes, b.attributes) or a.style != b.style:
+            return False
+        if a.event_handlers != b.event_handlers:
+            return False
+        for x, y in zip(a.children, b.children):
+            if isinstance(x, VDOM) and isinstance(y, VDOM):
+                pairs.append((x, y))
+            elif x != y:
+                return False
+    return True
+
+
+# Compiled validators by id(schema). Each entry keeps its schema alive, so the
+# id can't be reused by another schema while the entry is cached.
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def _validator_for(schema):
+    """Return the compiled validator for a schema, checking and compiling it only once"""
+    entry = _validators.get(id(schema))
+    if entry is not None and entry[0] is schema:
+        return entry[1]
+    with _validators_lock:
+        entry = _validators.get(id(schema))
+        if entry is None or entry[0] is not schema:
+            Draft4Validator.check_schema(schema)
+            if len(_validators) >= _VALIDATORS_MAXSIZE:
+                # Drop the oldest schema
+                del _validators[next(iter(_validators))]
+            entry = _validators[id(schema)] = (schema, Draft4Validator(schema))
+    return entry[1]
+
+
+def _validate(instance, schema):
+    """Validate instance against a JSON schema, raising ValidationError if it doesn't match
+
+    Schemas are compiled once and looked up by identity, so a schema must not
+    be modified after it has been used for validation.
+    """
+    if schema == _VDOM_SCHEMA_V1 and _is_vdom_element(instance):
+        return
+    # Anything rejected goes through jsonschema too, for the same error
+    error = best_match(_validator_for(schema).iter_errors(instance))
+    if error is not None:
+        raise ValidationError(_validate_err_template.format(schema, error))
+
+
+def _is_number(value):
+    """Whether value is a JSON schema number, which booleans aren't"""
+    if type(value) is int or type(value) is float:
+        return True
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+def _is_vdom_element(instance):
+    """Check instance against vdom_schema_v1 in a single pass, without recursion
+
+    Accepts exactly what jsonschema does: objects are dicts, arrays are lists
+    and numbers exclude booleans. The root's ``$ref`` overrides its sibling
+    keywords, as in draft 4, so an element may have extra keys.
+    """
+    if not isinstance(instance, dict):
+        return False
+    stack = [instance]
+    while stack:
+        node = stack.pop()
+        if node is None or isinstance(node, str):
+            continue
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            return False
+        try:
+            tag_name = node['tagName']
+            attributes = node['attributes']
+            children = node['children']
+        except KeyError:
+            return False
+        if not (isinstance(tag_name, str) and isinstance(attributes, dict)):
+            return False
+        if 'eventHandlers' in node and not isinstance(node['eventHandlers'], dict):
+            return False
+        if 'key' in node:
+            key = node['key']
+            if not (key is None or isinstance(key, str) or _is_number(key)):
+                return False
+        stack.append(children)
+    return True
+
+
+def _element_dict(tag_name, attributes, style, event_handlers, key, children, path=()):
+    """Build the schema dict for one element, given its already converted children
+
+    path is where the element is in the tree, by _segment, which the ids of
+    its event handlers are derived from.
+    """
+    attributes = dict(attributes.items())
+    if style:
+        attributes.update({"style": dict(style.items())})
+    vdom_dict = {'tagName': tag_name, 'attributes': attributes}
+    if event_handlers:
+        vdom_dict['eventHandlers'] = {
+            name: _handler_registry.serialize(path, name, handler)
+            for name, handler in event_handlers.items()
+        }
+    if key:
+        vdom_dict['key'] = key
+    vdom_dict['children'] = children
+    return vdom_dict
+
+
+def _to_inline_css(style):
+    """
+    Return inline CSS from CSS key / values
+    """
+    return "; ".join(['{}: {}'.format(convert_style_key(k), v) for k, v in style.items()])
+
+
+def _escape(text):
+    """html.escape, skipping the copy for the common text with nothing to escape"""
+    if _ESCAPED_CHARS.search(text) is None:
+        return text
+    return escape(text)
+
+
+def _start_tag(tag_name, attributes, style):
+    """Render the opening tag of an element, including its style and attributes"""
+    tag = '<' + _escape(tag_name)
+    if style:
+        # Important values are in double quotes - cgi.escape only escapes double quotes, not single quotes!
+        tag += ' style="' + _escape(_to_inline_css(style)) + '"'
+
+    for k, v in attributes.items():
+        # Important values are in double quotes - cgi.escape only escapes double quotes, not single quotes!
+        if isinstance(v, (str, bytes)):
+            tag += ' ' + _escape(k) + '="' + _escape(v) + '"'
+        if isinstance(v, bool) and v:
+            tag += ' ' + _escape(k)
+    return tag + '>'
+
+
+def _worth_caching(parts, length, largest):
+    """Whether to cache the fragment of an element
+
+    parts is how many pieces it took once cached subtrees were collapsed,
+    length how long it is and largest the length of the largest cached
+    fragment inside it. Every fragment a character is copied into is then at
+    least twice as long as the one before, so it is copied into at most a
+    logarithmic number of them.
+    """
+    return parts >= _FRAGMENT_MIN_PARTS and length >= 2 * largest
+
+
+def _render_html(root):
+    """Render a tree to HTML, splicing in the HTML cached by its subtrees
+
+    Start tags, text and end tags are appended to a single list of parts. As
+    in _encode_json, the HTML of root is cached, along with that of every
+    element _worth_caching.
+    """
+    if root._html is not None:
+        return root._html
+    start_tag = _start_tag(root.tag_name, root.attributes, root.style)
+    out = [start_tag]
+    append = out.append
+    # One entry per open element: the element, its remaining children, where it starts in out,
+    # the length of its HTML so far and that of the largest fragment in it
+    stack = [[root, iter(root.children), 0, len(start_tag), 0]]
+    while stack:
+        frame = stack[-1]
+        node, children, start = frame[:3]
+        for child in children:
+            if not isinstance(child, VDOM):
+                part = _escape(str(child))
+                append(part)
+                frame[3] += len(part)
+            elif child._html is not None:
+                append(child._html)
+                frame[3] += len(child._html)
+                frame[4] = max(frame[4], len(child._html))
+            else:
+                start_tag = _start_tag(child.tag_name, child.attributes, child.style)
+                stack.append([child, iter(child.children), len(out), len(start_tag), 0])
+                append(start_tag)
+                break
+        else:
+            stack.pop()
+            end_tag = '</' + _escape(node.tag_name) + '>'
+            append(end_tag)
+            frame[3] += len(end_tag)
+            parent = stack[-1] if stack else None
+            if parent is None or _worth_caching(len(out) - start, frame[3], frame[4]):
+                fragment = ''.join(out[start:])
+                del out[start:]
+                append(fragment)
+                _object_setattr(node, '_html', fragment)
+                frame[4] = len(fragment)
+            if parent is not None:
+                parent[3] += frame[3]
+                parent[4] = max(parent[4], frame[4])
+    return root._html
+
+
+def _iter_html_parts(root):
+    """Yield the HTML of a tree piece by piece, walking it with an explicit stack"""
+    if root._html is not None:
+        yield root._html
+        return
+    yield _start_tag(root.tag_name, root.attributes, root.style)
+    # One entry per open element: its remaining children and its tag name
+    stack = [(iter(root.children), root.tag_name)]
+    while stack:
+        children, tag_name = stack[-1]
+        for child in children:
+            if not isinstance(child, VDOM):
+                yield _escape(str(child))
+            elif child._html is not None:
+                yield child._html
+            else:
+                yield _start_tag(child.tag_name, child.attributes, child.style)
+                stack.append((iter(child.children), child.tag_name))
+                break
+        else:
+            stack.pop()
+            yield '</' + _escape(tag_name) + '>'
+
+
+def _approximate_size(node):
+    """Roughly how many bytes of JSON a node takes, not counting its children"""
+    if not isinstance(node, VDOM):
+        return len(node) + 4
+    size = 48 + len(node.tag_name)
+    for k, v in node.attributes.items():
+        size += len(k) + len(str(v)) + 6
+    for k, v in node.style.items():
+        size += len(k) + len(v) + 6
+    return size
+
+
+def _tree_dict(root, max_nodes=None, max_bytes=None, path=None):
+    """Convert a tree to a dict that passes our schema, walking it top down
+
+    With a budget, nodes are converted in document order until there are
+    more than max_nodes of them or roughly more than max_bytes of JSON;
+    what's left is replaced by a single notice element where the tree was
+    cut. path is where root is in the tree displayed, for the ids of event
+    handlers, root being displayed itself by default.
+    """
+    if path is None:
+        path = _root_path(root)
+    root_dict = _element_dict(
+        root.tag_name, root.attributes, root.style, root.event_handlers, root.key, [], path
+    )
+    nodes = 1
+    size = _approximate_size(root) if max_bytes is not None else 0
+    # One entry per open element: its remaining children, the list of converted ones, its index
+    # and the element
+    stack = [(enumerate(root.children), root_dict['children'], None, root)]
+    while stack:
+        children, converted, _, _ = stack[-1]
+        for index, child in children:
+            nodes += 1
+            if max_nodes is not None and nodes > max_nodes:
+                converted.append(_truncation_notice('{} nodes'.format(max_nodes)))
+                return root_dict
+            if max_bytes is not None:
+                size += _approximate_size(child)
+                if size > max_bytes:
+                    converted.append(_truncation_notice('{} bytes'.format(max_bytes)))
+                    return root_dict
+            if isinstance(child, VDOM):
+                child_dict = _element_dict(
+                    child.tag_name,
+                    child.attributes,
+                    child.style,
+                    child.event_handlers,
+                    child.key,
+                    [],
+                    _stack_path(path, stack, 2, 3, index, child) if child.event_handlers else (),
+                )
+                converted.append(child_dict)
+                stack.append((enumerate(child.children), child_dict['children'], index, child))
+                break
+            converted.append(child)
+        else:
+            stack.pop()
+    return root_dict
+
+
+def _truncation_notice(budget):
+    return {
+        'tagName': 'p',
+        'attributes': {'class': 'vdom-truncated'},
+        'children': ['Output truncated: this tree is larger than the display budget of ' + budget],
+    }
+
+
+def _within_budget(root, max_nodes=None, max_bytes=None):
+    """Whether a tree fits in the display budget, walking no more of it than the budget"""
+    nodes = 0
+    size = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        if max_nodes is not None and nodes > max_nodes:
+            return False
+        if max_bytes is not None:
+            size += _approximate_size(node)
+            if size > max_bytes:
+                return False
+        if isinstance(node, VDOM):
+            stack.extend(node.children)
+    return True
+
+
+def _budgeted_html(root, max_nodes=None, max_bytes=None):
+    """The HTML of a tree, or of the part of it _tree_dict keeps if it is over budget"""
+    if _within_budget(root, max_nodes, max_bytes):
+        return root.to_html()
+    return VDOM.from_dict(_tree_dict(root, max_nodes, max_bytes), validate=False).to_html()
+
+
+def _summary(parts, length):
+    """Join string parts up to length characters, marking any cut with an ellipsis"""
+    out = []
+    size = 0
+    for part in parts:
+        out.append(part)
+        size += len(part)
+        if size > length:
+            return ''.join(out)[:length] + '…'
+    return ''.join(out)
+
+
+def _mimebundle(representations, include=None, exclude=None):
+    """Compute the representations, given as {mimetype: function}, allowed by include and exclude"""
+    return {
+        mimetype: represent()
+        for mimetype, represent in representations.items()
+        if (not include or mimetype in include) and not (exclude and mimetype in exclude)
+    }
+
+
+def _json_prefix(node, path):
+    """Encode an element up to and including the opening bracket of its children"""
+    empty = _element_dict(
+        node.tag_name, node.attributes, node.style, node.event_handlers, node.key, [], path
+    )
+    return json.dumps(empty)[:-2]
+
+
+def _encode_json(root):
+    """Encode a tree to JSON, splicing in the fragments cached by its subtrees
+
+    The fragment of root is cached, along with that of every element that
+    took at least _FRAGMENT_MIN_PARTS pieces once its cached subtrees were
+    collapsed, and whose JSON is at least twice as long as the largest cached
+    fragment inside it (see _worth_caching). That keeps re-encoding a tree
+    that changed in one place close to the cost of the changed path, while
+    any character is only copied into a logarithmic number of cached
+    fragments.
+
+    Elements with event handlers in their subtree are never cached, as the
+    ids of handlers depend on where they are in the tree.
+    """
+    root_path = _root_path(root)
+    prefix = _json_prefix(root, root_path)
+    parts = [prefix]
+    # One entry per open element: the element, its remaining children, where it starts in
+    # parts, its index, whether there are event handlers in its subtree, the length of its
+    # JSON so far and that of the largest fragment in it
+    stack = [[root, enumerate(root.children), 0, None, bool(root.event_handlers), len(prefix), 0]]
+    while stack:
+        frame = stack[-1]
+        node, children, start = frame[:3]
+        for index, child in children:
+            if len(parts) > start + 1:
+                parts.append(', ')
+                frame[5] += 2
+            if not isinstance(child, VDOM):
+                part = json.dumps(child)
+                parts.append(part)
+                frame[5] += len(part)
+            elif child._json is not None:
+                parts.append(child._json)
+                frame[5] += len(child._json)
+                frame[6] = max(frame[6], len(child._json))
+            else:
+                handlers = bool(child.event_handlers)
+                path = _stack_path(root_path, stack, 3, 0, index, child) if handlers else ()
+                prefix = _json_prefix(child, path)
+                stack.append(
+                    [child, enumerate(child.children), len(parts), index, handlers, len(prefix), 0]
+                )
+                parts.append(prefix)
+                break
+        else:
+            stack.pop()
+            parts.append(']}')
+            frame[5] += 2
+            parent = stack[-1] if stack else None
+            if frame[4]:
+                if parent is not None:
+                    parent[4] = True
+            elif parent is None or _worth_caching(len(parts) - start, frame[5], frame[6]):
+                fragment = ''.join(parts[start:])
+                del parts[start:]
+                parts.append(fragment)
+                _object_setattr(node, '_json', fragment)
+                frame[6] = len(fragment)
+            if parent is not None:
+                parent[5] += frame[5]
+                parent[6] = max(parent[6], frame[6])
+    return ''.join(parts)
+
+
+def _iter_json_parts(root):
+    """Yield the JSON encoding of a tree piece by piece, walking it with an explicit stack"""
+    if root._json is not None:
+        yield root._json
+        return
+    root_path = _root_path(root)
+    yield _json_prefix(root, root_path)
+    # One entry per open element: its remaining children, whether one was written yet, its index
+    # and the element
+    stack = [[enumerate(root.children), False, None, root]]
+    while stack:
+        top = stack[-1]
+        for index, child in top[0]:
+            separator = ', ' if top[1] else ''
+            top[1] = True
+            if isinstance(child, VDOM) and child._json is not None:
+                yield separator + child._json
+            elif isinstance(child, VDOM):
+                if child.event_handlers:
+                    path = _stack_path(root_path, stack, 2, 3, index, child)
+                else:
+                    path = ()
+                yield separator + _json_prefix(child, path)
+                stack.append([enumerate(child.children), False, index, child])
+                break
+            yield separator + json.dumps(child)
+        else:
+            stack.pop()
+            yield ']}'
+
+
+def _chunked(parts, chunk_size):
+    """Join small string parts into chunks of at least chunk_size characters"""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
 
 
 def to_json(el, schema=None):
@@ -50,10 +726,7 @@ def to_json(el, schema=None):
         json_el = el
 
     if schema:
-        try:
-            validate(instance=json_el, schema=schema, cls=Draft4Validator)
-        except ValidationError as e:
-            raise ValidationError(_validate_err_template.format(schema, e))
+        _validate(json_el, schema)
 
     return json_el
 
@@ -91,15 +764,10 @@ class EventHandler(object):
         self._prevent_default = prevent_default
         self._stop_propagation = stop_propagation
 
-        self.comm = None
-        # Register a new comm for this event handler
-        if get_ipython():
-            comm_manager = get_ipython().kernel.comm_manager
-            comm_manager.register_target(hash(self), self._on_comm_opened)
-
-    def serialize(self):
+    def serialize(self, handler_id=None):
+        """The eventHandlers entry for this handler, under handler_id or else its hash"""
         return {
-            "hash": hash(self),
+            "hash": hash(self) if handler_id is None else handler_id,
             "preventDefault": self._prevent_default,
             "stopPropagation": self._stop_propagation,
         }
@@ -110,17 +778,92 @@ class EventHandler(object):
     def __hash__(self):
         return hash(self._handler)
 
+
+class _HandlerRegistry(object):
+    """Event handlers by id, every id registered as a comm target only once
+
+    The id of a handler is derived from its component path: where its element
+    is in the tree, by key or else by index, starting with the key of the
+    root, the qualified name of the function and the name of the event. A
+    component re-rendered with new inline functions so gets the same ids, and
+    the registry just points them at the new functions. Inside
+    ``scope(name)``, ids are derived from name too, so that displays of the
+    same component don't share them; roots with different keys don't either.
+
+    Only the maxsize handlers serialized last are kept, and their comm targets.
+    """
+
+    def __init__(self, maxsize=_HANDLERS_MAXSIZE):
+        self.maxsize = maxsize
+        # Ordered from the handler serialized least recently
+        self._handlers = {}
+        self._registered = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def scope(self, name):
+        previous = getattr(self._local, 'scope', None)
+        self._local.scope = name
+        try:
+            yield
+        finally:
+            self._local.scope = previous
+
+    def get(self, handler_id):
+        """The handler an id points at, or None"""
+        return self._handlers.get(handler_id)
+
+    def serialize(self, path, event_name, handler):
+        """Point the id for handler at it, and return its eventHandlers entry"""
+        function = handler._handler if isinstance(handler, EventHandler) else handler
+        identity = (
+            getattr(self._local, 'scope', None),
+            getattr(function, '__qualname__', type(function).__qualname__),
+            path,
+            event_name,
+        )
+        handler_id = hashlib.blake2b(repr(identity).encode('utf-8'), digest_size=8).hexdigest()
+        kernel = getattr(get_ipython(), 'kernel', None)
+        evicted = []
+        with self._lock:
+            self._handlers.pop(handler_id, None)
+            self._handlers[handler_id] = handler
+            while len(self._handlers) > self.maxsize:
+                oldest = next(iter(self._handlers))
+                del self._handlers[oldest]
+                if oldest in self._registered:
+                    self._registered.discard(oldest)
+                    evicted.append(oldest)
+            register = kernel is not None and handler_id not in self._registered
+            if register:
+                self._registered.add(handler_id)
+        if kernel is not None:
+            for oldest in evicted:
+                kernel.comm_manager.unregister_target(oldest, self._on_comm_opened)
+        if register:
+            kernel.comm_manager.register_target(handler_id, self._on_comm_opened)
+        if isinstance(handler, EventHandler):
+            return handler.serialize(handler_id)
+        return {"hash": handler_id, "preventDefault": False, "stopPropagation": False}
+
     def _on_comm_opened(self, comm, msg):
-        self.comm = comm
-        comm.on_msg(self._on_comm_msg)
-        comm.send('Comm target "{hash}" registered by vdom'.format(hash=hash(self)))
+        handler_id = msg['content']['target_name']
+        comm.on_msg(functools.partial(self._on_comm_msg, comm, handler_id))
+        comm.send('Comm target "{hash}" registered by vdom'.format(hash=handler_id))
 
-    def _on_comm_msg(self, msg):
+    def _on_comm_msg(self, comm, handler_id, msg):
         data = msg['content']['data']
         event = json.loads(data)
-        return_value = self(event)
+        handler = self._handlers.get(handler_id)
+        if handler is None:
+            return
+        return_value = handler(event)
         if return_value:
-            self.comm.send(return_value)
+            comm.send(return_value)
+
+
+_handler_registry = _HandlerRegistry()
 
 
 class VDOM(object):
@@ -132,8 +875,34 @@ class VDOM(object):
     >>> h1('Hey')
     """
 
-    # This class should only have these 7 attributes
-    __slots__ = ['tag_name', 'attributes', 'style', 'children', 'key', 'event_handlers', '_frozen']
+    # This class should only have these 7 attributes, plus lazily computed caches (the
+    # structural hash, whether the subtree has event handlers, encoded JSON and rendered
+    # HTML) and a weakref slot for the intern table
+    __slots__ = [
+        'tag_name',
+        'attributes',
+        'style',
+        'children',
+        'key',
+        'event_handlers',
+        '_frozen',
+        '_hash',
+        '_has_handlers',
+        '_json',
+        '_html',
+        '__weakref__',
+    ]
+
+    # Display settings, shared by every instance. Set them on the class:
+    # Whether display bundles include the full HTML as text/html, besides the VDOM JSON.
+    # It's also computed whenever the include argument of _repr_mimebundle_ asks for it.
+    mimebundle_html = False
+    # Most characters of HTML shown in the text/plain summary of display bundles
+    text_summary_length = 500
+    # Budget for the VDOM JSON and HTML of display bundles: past this many nodes, or roughly
+    # this many bytes, the rest of the tree is left out and a notice is shown. None for no limit.
+    display_max_nodes = 100000
+    display_max_bytes = 20 * 2**20
 
     def __init__(
         self,
@@ -156,76 +925,138 @@ class VDOM(object):
             attributes = vdom_obj.attributes
             children = vdom_obj.children
             key = vdom_obj.key
-        self.tag_name = tag_name
-        # Sort attributes so our outputs are predictable
-        self.attributes = FrozenDict(sorted(attributes.items())) if attributes else FrozenDict()
-        self.children = tuple(children) if children else tuple()
-        self.key = key
-        # Sort attributes so our outputs are predictable
-        self.style = FrozenDict(sorted(style.items())) if style else FrozenDict()
-        self.event_handlers = (
-            FrozenDict(sorted(event_handlers.items())) if event_handlers else FrozenDict()
+        children = tuple(children) if children else ()
+        style = _freeze(style)
+
+        _check_children(children)
+        _check_style(style)
+
+        _init_slots(
+            self,
+            tag_name,
+            _freeze(attributes),
+            style,
+            children,
+            key,
+            _freeze(event_handlers),
         )
 
-        # Validate that all children are VDOMs or strings
-        if not all(isinstance(c, (VDOM, str, bytes)) for c in self.children):
-            raise ValueError('Children must be a list of VDOM objects or strings')
-
-        # All style keys & values must be strings
-        if not all(
-            isinstance(k, (str, bytes)) and isinstance(v, (str, bytes))
-            for k, v in self.style.items()
-        ):
-            raise ValueError('Style must be a dict with string keys & values')
-
-        # mark completion of object creation. Object is immutable from now.
-        self._frozen = True
-
         if schema is not None:
             self.validate(schema)
 
+    @classmethod
+    def _trusted(cls, tag_name, attributes, style, children, key, event_handlers):
+        """Build a VDOM from inputs that are already known to be well formed
+
+        This skips the child and style type checks of ``__init__`` as well as the
+        immutability guard, so only library code that produced its inputs itself
+        (or validated them some other way) should use it. ``attributes``, ``style``
+        and ``event_handlers`` must already be FrozenDicts, as returned by
+        ``_freeze``, and ``children`` must be a tuple of VDOM objects and strings.
+        """
+        node = cls.__new__(cls)
+        _init_slots(node, tag_name, attributes, style, children, key, event_handlers)
+        return node
+
+    def __reduce__(self):
+        """Copy and pickle through _trusted, so the copy is frozen and its caches are empty"""
+        return (
+            type(self)._trusted,
+            (
+                self.tag_name,
+                self.attributes,
+                self.style,
+                self.children,
+                self.key,
+                self.event_handlers,
+            ),
+        )
+
     def __setattr__(self, attr, value):
         """
         Make instances immutable after creation
         """
-        if hasattr(self, '_frozen') and self._frozen:
+        if getattr(self, '_frozen', False):
             raise AttributeError("Cannot change attribute of immutable object")
         super(VDOM, self).__setattr__(attr, value)
 
+    def __hash__(self):
+        """
+        Structural hash, computed once per node from its own fields and the
+        hashes of its children
+        """
+        h = self._hash
+        if h is None:
+            h = _structural_hash(self)
+        return h
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, VDOM):
+            return NotImplemented
+        return _structurally_equal(self, other)
+
     def validate(self, schema):
         """
         Validate VDOM against given JSON Schema
 
         Raises ValidationError if schema does not match
         """
-        try:
-            validate(instance=self.to_dict(), schema=schema, cls=Draft4Validator)
-        except ValidationError as e:
-            raise ValidationError(_validate_err_template.format(VDOM_SCHEMA, e))
+        _validate(self.to_dict(), schema)
 
     def to_dict(self):
         """Converts VDOM object to a dictionary that passes our schema"""
-        attributes = dict(self.attributes.items())
-        if self.style:
-            attributes.update({"style": dict(self.style.items())})
-        vdom_dict = {'tagName': self.tag_name, 'attributes': attributes}
-        if self.event_handlers:
-            event_handlers = dict(self.event_handlers.items())
-            for key, handler in event_handlers.items():
-                if not isinstance(handler, EventHandler):
-                    handler = EventHandler(handler)
-                event_handlers[key] = handler.serialize()
-            vdom_dict['eventHandlers'] = event_handlers
-        if self.key:
-            vdom_dict['key'] = self.key
-        vdom_dict['children'] = [c.to_dict() if isinstance(c, VDOM) else c for c in self.children]
-        return vdom_dict
+        return _tree_dict(self)
 
     def to_json(self):
-        return json.dumps(self.to_dict())
+        """Encode the tree as JSON, reusing the JSON cached by any subtree
+
+        The result is cached on this node, and on every large enough subtree,
+        so encoding a new tree that shares most of its subtrees with one that
+        was encoded before only has to encode the new parts.
+        """
+        fragment = self._json
+        if fragment is None:
+            fragment = _encode_json(self)
+        return fragment
+
+    def iter_json(self, chunk_size=_CHUNK_SIZE):
+        """Yield the JSON of ``to_json()`` in chunks of roughly ``chunk_size`` characters
+
+        The tree is encoded while it is walked, so memory use depends on the
+        depth of the tree rather than its size.
+        """
+        return _chunked(_iter_json_parts(self), chunk_size)
+
+    def render_json_to(self, stream, chunk_size=_CHUNK_SIZE):
+        """Write the JSON of ``to_json()`` to a file-like object, chunk by chunk"""
+        for chunk in self.iter_json(chunk_size):
+            stream.write(chunk)
 
     def to_html(self):
-        return self._repr_html_()
+        """
+        Return HTML representation of VDOM object.
+
+        HTML escaping is performed wherever necessary. The result is cached on
+        this node, and on every large enough subtree, so rendering a new tree
+        that shares most of its subtrees with one rendered before only has to
+        render the new parts.
+        """
+        return _render_html(self)
+
+    def iter_html(self, chunk_size=_CHUNK_SIZE):
+        """Yield the HTML of ``to_html()`` in chunks of roughly ``chunk_size`` characters
+
+        The tree is rendered while it is walked, so memory use depends on the
+        depth of the tree rather than its size.
+        """
+        return _chunked(_iter_html_parts(self), chunk_size)
+
+    def render_html_to(self, stream, chunk_size=_CHUNK_SIZE):
+        """Write the HTML of ``to_html()`` to a file-like object, chunk by chunk"""
+        for chunk in self.iter_html(chunk_size):
+            stream.write(chunk)
 
     def json_contents(self):
         warnings.warn('VDOM.json_contents method is deprecated, use to_json instead')
@@ -235,48 +1066,57 @@ class VDOM(object):
         """
         Return inline CSS from CSS key / values
         """
-        return "; ".join(['{}: {}'.format(convert_style_key(k), v) for k, v in style.items()])
+        return _to_inline_css(style)
 
     def _repr_html_(self):
+        """HTML for IPython, only when mimebundle_html is set
+
+        IPython's formatter asks for every mimetype _repr_mimebundle_ left
+        out, so returning the full HTML here would render it on every display.
+        Like the bundle, it is cut short past the display budget.
         """
-        Return HTML representation of VDOM object.
+        if not self.mimebundle_html:
+            return None
+        return _budgeted_html(self, self.display_max_nodes, self.display_max_bytes)
+
+    def _repr_mimebundle_(self, include=None, exclude=None, **kwargs):
+        """Display as VDOM JSON, with the start of the HTML as a text/plain summary
 
-        HTML escaping is performed wherever necessary.
+        Only the mimetypes allowed by include and exclude are computed. Trees
+        larger than display_max_nodes or display_max_bytes are cut short, in
+        the VDOM JSON as in the HTML.
         """
-        # Use StringIO to avoid a large number of memory allocations with string concat
-        with io.StringIO() as out:
-            out.write('<{tag}'.format(tag=escape(self.tag_name)))
-            if self.style:
-                # Important values are in double quotes - cgi.escape only escapes double quotes, not single quotes!
-                out.write(' style="{css}"'.format(css=escape(self._to_inline_css(self.style))))
-
-            for k, v in self.attributes.items():
-                # Important values are in double quotes - cgi.escape only escapes double quotes, not single quotes!
-                if isinstance(v, (str, bytes)):
-                    out.write(' {key}="{value}"'.format(key=escape(k), value=escape(v)))
-                if isinstance(v, bool) and v:
-                    out.write(' {key}'.format(key=escape(k)))
-            out.write('>')
-
-            for c in self.children:
-                if isinstance(c, (str, bytes)):
-                    out.write(escape(str(c)))
-                else:
-                    out.write(c._repr_html_())
+        representations = {
+            'application/vdom.v1+json': lambda: _tree_dict(
+                self, self.display_max_nodes, self.display_max_bytes
+            ),
+            'text/plain': lambda: _summary(_iter_html_parts(self), self.text_summary_length),
+        }
+        if self.mimebundle_html or (include and 'text/html' in include):
+            representations['text/html'] = lambda: _budgeted_html(
+                self, self.display_max_nodes, self.display_max_bytes
+            )
+        return _mimebundle(representations, include, exclude)
 
-            out.write('</{tag}>'.format(tag=escape(self.tag_name)))
+    @classmethod
+    def from_dict(cls, value, validate=True):
+        """Build a VDOM tree from a dict in the VDOM JSON format
 
-            return out.getvalue()
+        The whole dict is validated against ``VDOM_SCHEMA`` once, up front,
+        unless ``validate`` is False; raises ValidationError if it doesn't
+        match.
+        """
+        if validate:
+            _validate(value, VDOM_SCHEMA)
+        return cls._build_from_dict(value)
 
-    def _repr_mimebundle_(self, include=None, exclude=None, **kwargs):
-        return {'application/vdom.v1+json': self.to_dict(), 'text/plain': self.to_html()}
+    @classmethod
+    def _build_from_dict(cls, root):
+        return _convert_tree(root, _is_dict, _dict_children, _check_text, cls._from_converted_dict)
 
     @classmethod
-    def from_dict(cls, value):
-        try:
-            validate(instance=value, schema=VDOM_SCHEMA, cls=Draft4Validator)
-        except ValidationError as e:
-            raise ValidationError(_validate_err_template.format(VDOM_SCHEMA, e))
+    def _from_converted_dict(cls, value, children):
+        """Build one element from its dict, given its already built children"""
         attributes = value.get('attributes', {})
         style = None
         event_handlers = None
@@ -291,15 +1131,16 @@ class VDOM(object):
                     event_handlers = {key: attributes.pop(key)}
                 else:
                     event_handlers[key] = attributes.pop(key)
-        return cls(
-            tag_name=value['tagName'],
-            attributes=attributes,
-            style=style,
-            event_handlers=event_handlers,
-            children=[
-                VDOM.from_dict(c) if isinstance(c, dict) else c for c in value.get('children', [])
-            ],
-            key=value.get('key'),
+        # The schema doesn't cover style, so that's the one check we still need
+        style = _freeze(style)
+        _check_style(style)
+        return cls._trusted(
+            value['tagName'],
+            _freeze(attributes),
+            style,
+            tuple(children),
+            value.get('key'),
+            _freeze(event_handlers),
         )
 
 
@@ -310,15 +1151,72 @@ def _upper_replace(matchobj):
     return '-' + matchobj.group(0).lower()
 
 
+@functools.lru_cache(maxsize=_STYLE_KEYS_MAXSIZE)
 def convert_style_key(key):
     """Converts style names from DOM to css styles.
 
+    Stylesheets only use a handful of distinct keys, so conversions are cached.
+
     >>> convert_style_key("backgroundColor")
     "background-color"
     """
     return re.sub(upper, _upper_replace, key)
 
 
+class _InternTable(object):
+    """Weak-valued table of VDOM nodes, keyed by their structural hash
+
+    Holds at most ``maxsize`` entries; once full, new nodes are simply not added
+    until older ones have been garbage collected.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._nodes = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def intern(self, node):
+        if not _hashable(tuple(node.attributes.values())):
+            # Leave elements with mutable attribute values, such as lists, to themselves
+            return node
+        h = hash(node)
+        existing = self._nodes.get(h)
+        if existing is None:
+            if len(self._nodes) < self.maxsize:
+                self._nodes[h] = node
+            return node
+        # Children were interned first, so this is usually an identity check per child
+        return existing if existing == node else node
+
+
+_intern_table = None
+
+
+def enable_interning(maxsize=65536):
+    """Share one instance between identical subtrees built by components
+
+    Once enabled, every element created through ``create_component`` (and so
+    every helper in ``vdom.helpers`` and ``vdom.svg``) is looked up in a weak,
+    bounded table, and an equal element that is still alive elsewhere is
+    returned instead of the new one. Calling it again replaces the table.
+
+    Examples:
+        >>> enable_interning()
+        >>> div(p('hey')) is div(p('hey'))
+        True
+    """
+    global _intern_table
+    _intern_table = _InternTable(maxsize)
+
+
+def disable_interning():
+    """Stop interning elements built by components and drop the table"""
+    global _intern_table
+    _intern_table = None
+
+
 def create_component(tag_name, allow_children=True):
     """
     Create a component for an HTML Tag
@@ -340,11 +1238,9 @@ def create_component(tag_name, allow_children=True):
                 # We want children to be tuples and not lists, so
                 # they can be immutable
                 children = tuple(children[0])
-        style = None
         event_handlers = None
+        style = kwargs.pop('style', None)
         attributes = dict(**kwargs)
-        if 'style' in kwargs:
-            style = kwargs.pop('style')
         if 'attributes' in kwargs:
             attributes = kwargs['attributes']
         for key, value in attributes.items():
@@ -358,7 +1254,15 @@ def create_component(tag_name, allow_children=True):
             # We don't allow children, but some were passed in
             raise ValueError('<{tag_name} /> cannot have children'.format(tag_name=tag_name))
 
-        v = VDOM(tag_name, attributes, style, children, None, event_handlers)
+        children = tuple(children) if children else ()
+        style = _freeze(style)
+        _check_children(children)
+        _check_style(style)
+        v = VDOM._trusted(
+            tag_name, _freeze(attributes), style, children, None, _freeze(event_handlers)
+        )
+        if _intern_table is not None:
+            v = _intern_table.intern(v)
         return v
 
     return _component
@@ -0,0 +1,432 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+vdom.diffing
+~~~~~~~~~~~~
+
+Compute the operations that turn one VDOM tree into another, and apply them.
+
+from vdom import apply_diff, diff
+
+ops = diff(old, new)
+apply_diff(old, ops) == new
+
+"""
+import bisect
+from collections import namedtuple
+
+from .core import VDOM, _convert_tree, _freeze, _same_values, _subtree_has_handlers
+
+# Operations address nodes by path, the tuple of child indices leading to them
+# from the root (), in the tree as left by the operations before them.
+
+# Insert node so that it ends up at path
+Insert = namedtuple('Insert', ['path', 'node'])
+# Remove the node at path
+Remove = namedtuple('Remove', ['path'])
+# Take the node at from_path out, then put it back at path, under the same parent
+Move = namedtuple('Move', ['from_path', 'path'])
+# Replace the node at path, an element that can't be updated in place or a text
+# that became an element, with node
+Replace = namedtuple('Replace', ['path', 'node'])
+# Replace the text at path
+ReplaceText = namedtuple('ReplaceText', ['path', 'text'])
+# Set an attribute of the element at path to value, or remove it if value is REMOVED.
+# The style of an element is its 'style' attribute, as in to_dict().
+ReplaceAttribute = namedtuple('ReplaceAttribute', ['path', 'name', 'value'])
+
+
+class _Removed(object):
+    def __repr__(self):
+        return 'REMOVED'
+
+
+REMOVED = _Removed()
+
+
+def diff(old, new):
+    """List the operations that turn the tree old into new
+
+    Children are matched by key when they have one. Children without a key
+    are matched with an equal text or subtree (by structural hash) if there is
+    one, and otherwise in order with the other children of the same kind:
+    texts with texts, elements with elements of the same tag. Matched
+    elements are updated in place, everything else is inserted or removed.
+    Children are moved as little as possible, see ``reconcile``. Subtrees
+    that are the same object, or that have equal hashes, are skipped without
+    looking inside.
+
+    Elements with a different tag, key or event handlers are replaced rather
+    than updated, which is the only way the root can change as a whole: in
+    that case the result is a single ``Replace((), new)``. So are elements
+    without a key that end up at another index with event handlers in their
+    subtree, as the ids of the handlers depend on the index.
+    """
+    if not _updatable(old, new):
+        return [Replace((), new)]
+    ops = []
+    # Paths are kept as links, (parent link, index), until an operation needs them
+    pending = [(old, new, None)]
+    while pending:
+        old, new, link = pending.pop()
+        if _unchanged(old, new):
+            continue
+        ops.extend(_attribute_ops(old, new, link))
+        ops.extend(_children_ops(old.children, new.children, link, pending))
+    return ops
+
+
+def apply_diff(tree, ops):
+    """Apply operations computed by ``diff`` to a tree, returning the new tree
+
+    Every subtree the operations don't touch is shared with the old tree.
+    """
+    patcher = _Patcher(tree)
+    for op in ops:
+        patcher.apply(op)
+    return patcher.tree()
+
+
+def _updatable(old, new):
+    """Whether old can be turned into new by updating its attributes and children"""
+    if not (isinstance(old, VDOM) and isinstance(new, VDOM)):
+        return False
+    if old.tag_name != new.tag_name or old.key != new.key:
+        return False
+    return old.event_handlers == new.event_handlers
+
+
+def _unchanged(old, new):
+    if old is new:
+        return True
+    # Matching children has hashed most subtrees already, but only trust cached hashes
+    if old._hash is None or new._hash is None or old._hash != new._hash:
+        return False
+    return old == new
+
+
+def reconcile(old_keys, new_keys):
+    """Plan how to turn a list with unique keys old_keys into one with new_keys
+
+    Returns the steps to apply in order: ``('remove', index)`` for every old
+    key that is gone, then ``('move', from_index, to_index)`` for the kept
+    keys that have to move, with to_index counted once the item is taken
+    out, then ``('insert', index)`` for every new key, index being its
+    position in new_keys. The kept keys in the longest run that is already in
+    the right order stay put, so the number of moves is as small as it can be.
+
+    Examples:
+        >>> reconcile('abcd', 'dabe')
+        [('remove', 2), ('move', 2, 0), ('insert', 3)]
+    """
+    new_positions = {key: i for i, key in enumerate(new_keys)}
+    steps = []
+    # Kept items, by their position in new_keys
+    kept = []
+    for index in range(len(old_keys) - 1, -1, -1):
+        position = new_positions.get(old_keys[index])
+        if position is None:
+            steps.append(('remove', index))
+        else:
+            kept.append(position)
+    kept.reverse()
+
+    # Place the kept items outside the longest increasing run, in their new order,
+    # right after the kept item that comes before them in new_keys. Each one ends up
+    # in a run following the stable item before it (or at the front), so a slot can
+    # be laid out for it there up front, and indices are counts of occupied slots.
+    stable = set(_longest_increasing_subsequence(kept))
+    order = sorted(range(len(kept)), key=kept.__getitem__)
+    runs = {}
+    anchor = None
+    for index in order:
+        if index in stable:
+            anchor = index
+        else:
+            runs.setdefault(anchor, []).append(index)
+    origins = []
+    targets = {}
+    slots = 0
+    for index in [None] + list(range(len(kept))):
+        if index is not None:
+            origins.append(slots)
+            slots += 1
+        for moved in runs.get(index, ()):
+            targets[moved] = slots
+            slots += 1
+    occupied = _Occupied(slots)
+    for origin in origins:
+        occupied.add(origin, 1)
+    for index in order:
+        if index not in stable:
+            origin = origins[index]
+            from_index = occupied.count(origin)
+            occupied.add(origin, -1)
+            to_index = occupied.count(targets[index])
+            occupied.add(targets[index], 1)
+            steps.append(('move', from_index, to_index))
+
+    old_set = set(old_keys)
+    steps.extend(('insert', index) for index, key in enumerate(new_keys) if key not in old_set)
+    return steps
+
+
+def _longest_increasing_subsequence(values):
+    """Indices of a longest strictly increasing subsequence of values, in O(n log n)"""
+    # tails[k] is the index of the smallest value ending an increasing run of length k + 1
+    tails = []
+    tail_values = []
+    previous = [None] * len(values)
+    for i, value in enumerate(values):
+        k = bisect.bisect_left(tail_values, value)
+        if k:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+    indices = []
+    i = tails[-1] if tails else None
+    while i is not None:
+        indices.append(i)
+        i = previous[i]
+    indices.reverse()
+    return indices
+
+
+class _Occupied(object):
+    """Counts of occupied slots, as a Fenwick tree: both operations take O(log n)"""
+
+    __slots__ = ['tree']
+
+    def __init__(self, size):
+        self.tree = [0] * (size + 1)
+
+    def add(self, slot, delta):
+        slot += 1
+        while slot < len(self.tree):
+            self.tree[slot] += delta
+            slot += slot & -slot
+
+    def count(self, slot):
+        """Number of occupied slots before slot"""
+        total = 0
+        while slot:
+            total += self.tree[slot]
+            slot -= slot & -slot
+        return total
+
+
+def _path(link):
+    """Turn a chain of (parent link, index) pairs into a path"""
+    indices = []
+    while link is not None:
+        link, index = link
+        indices.append(index)
+    return tuple(reversed(indices))
+
+
+def _attribute_ops(old, new, link):
+    same_attributes = _same_values(old.attributes, new.attributes)
+    same_style = old.style == new.style
+    if same_attributes and same_style:
+        return []
+    path = _path(link)
+    ops = []
+    if not same_attributes:
+        for name, value in new.attributes.items():
+            old_value = old.attributes.get(name, REMOVED)
+            if old_value != value or type(old_value) is not type(value):
+                ops.append(ReplaceAttribute(path, name, value))
+        for name in old.attributes:
+            if name not in new.attributes:
+                ops.append(ReplaceAttribute(path, name, REMOVED))
+    if not same_style:
+        ops.append(ReplaceAttribute(path, 'style', new.style or REMOVED))
+    return ops
+
+
+def _content(child):
+    """What a child without a key is recognized by in the other list, if anything"""
+    if not isinstance(child, VDOM):
+        return ('text', child)
+    return ('hash', hash(child))
+
+
+def _count(kinds):
+    """Tell repeats apart by numbering them, so every key in a list is unique"""
+    counts = {}
+    keys = []
+    for kind in kinds:
+        count = counts.get(kind, 0)
+        counts[kind] = count + 1
+        keys.append(kind + (count,))
+    return keys
+
+
+def _match_keys(old_children, new_children):
+    """Keys for matching children: by key if they have one, then by content
+    (equal texts and equal subtrees), then in order among the remaining texts
+    and the remaining elements with the same tag"""
+    keys = []
+    for children in (old_children, new_children):
+        keys.append(
+            _count(
+                ('key', c.key) if isinstance(c, VDOM) and c.key is not None else _content(c)
+                for c in children
+            )
+        )
+    old_keys, new_keys = keys
+    matched = set(old_keys).intersection(new_keys)
+    for children, keys in ((old_children, old_keys), (new_children, new_keys)):
+        unmatched = [i for i, key in enumerate(keys) if key not in matched and key[0] != 'key']
+        fallback = _count(
+            ('text',) if not isinstance(children[i], VDOM) else ('tag', children[i].tag_name)
+            for i in unmatched
+        )
+        for i, key in zip(unmatched, fallback):
+            keys[i] = ('in order',) + key
+    return old_keys, new_keys
+
+
+def _children_ops(old_children, new_children, link, pending):
+    """Operations to turn old_children into new_children, at the element at link
+
+    Matched elements that can be updated are added to pending, along with the
+    link to where they end up.
+    """
+    path = None
+    old_keys, new_keys = _match_keys(old_children, new_children)
+    old_positions = {key: i for i, key in enumerate(old_keys)}
+
+    ops = []
+    if old_keys != new_keys:
+        path = _path(link)
+        for step in reconcile(old_keys, new_keys):
+            if step[0] == 'remove':
+                ops.append(Remove(path + (step[1],)))
+            elif step[0] == 'move':
+                ops.append(Move(path + (step[1],), path + (step[2],)))
+            else:
+                ops.append(Insert(path + (step[1],), new_children[step[1]]))
+
+    # Finally update matched children where they ended up
+    for index, key in enumerate(new_keys):
+        if key not in old_positions:
+            continue
+        old_index = old_positions[key]
+        old, new = old_children[old_index], new_children[index]
+        # The ids of handlers below an element without a key depend on its index
+        shifted = old_index != index and key[0] != 'key'
+        if shifted and isinstance(new, VDOM) and _subtree_has_handlers(new):
+            path = _path(link) if path is None else path
+            ops.append(Replace(path + (index,), new))
+            continue
+        if old is new:
+            continue
+        if isinstance(new, VDOM) and _updatable(old, new):
+            pending.append((old, new, (link, index)))
+            continue
+        path = _path(link) if path is None else path
+        if isinstance(new, VDOM):
+            ops.append(Replace(path + (index,), new))
+        elif old != new:
+            ops.append(ReplaceText(path + (index,), new))
+    return ops
+
+
+class _Patcher(object):
+    """Applies operations to a tree one at a time, copying only the elements on
+    the way to each change"""
+
+    def __init__(self, tree):
+        self.root = tree
+
+    def apply(self, op):
+        if type(op) is Replace and op.path == ():
+            self.root = op.node
+            return
+        if type(self.root) is not _Draft:
+            self.root = _Draft(self.root)
+        element = self.root
+        for index in op.path if type(op) is ReplaceAttribute else op.path[:-1]:
+            child = element.children[index]
+            if type(child) is not _Draft:
+                child = element.children[index] = _Draft(child)
+            element = child
+        _apply(element, op)
+
+    def node(self, path):
+        """The node at path in the tree as patched so far"""
+        node = self.root
+        for index in path:
+            node = node.children[index]
+        return _freeze_draft(node) if type(node) is _Draft else node
+
+    def tree(self):
+        return _freeze_draft(self.root) if type(self.root) is _Draft else self.root
+
+
+class _Draft(object):
+    """A mutable copy of one element, made on the way to an operation's target"""
+
+    __slots__ = ['tag_name', 'attributes', 'style', 'children', 'key', 'event_handlers']
+
+    def __init__(self, node):
+        self.tag_name = node.tag_name
+        self.attributes = dict(node.attributes)
+        self.style = node.style
+        self.children = list(node.children)
+        self.key = node.key
+        self.event_handlers = node.event_handlers
+
+    def freeze(self, children):
+        return VDOM._trusted(
+            self.tag_name,
+            _freeze(self.attributes),
+            _freeze(self.style),
+            tuple(children),
+            self.key,
+            self.event_handlers,
+        )
+
+
+def _freeze_draft(draft):
+    return _convert_tree(draft, _is_draft, _draft_children, _identity, _Draft.freeze)
+
+
+def _is_draft(value):
+    return type(value) is _Draft
+
+
+def _draft_children(draft):
+    return draft.children
+
+
+def _identity(value):
+    return value
+
+
+def _apply(element, op):
+    """Apply op to element, the parent of its target or, for attributes, the target"""
+    kind = type(op)
+    if kind is Insert:
+        element.children.insert(op.path[-1], op.node)
+    elif kind is Remove:
+        del element.children[op.path[-1]]
+    elif kind is Move:
+        element.children.insert(op.path[-1], element.children.pop(op.from_path[-1]))
+    elif kind is Replace:
+        element.children[op.path[-1]] = op.node
+    elif kind is ReplaceText:
+        element.children[op.path[-1]] = op.text
+    elif kind is ReplaceAttribute and op.name == 'style':
+        element.style = {} if op.value is REMOVED else op.value
+    elif kind is ReplaceAttribute and op.value is REMOVED:
+        del element.attributes[op.name]
+    elif kind is ReplaceAttribute:
+        element.attributes[op.name] = op.value
+    else:
+        raise ValueError('Unknown diff operation: {!r}'.format(op))
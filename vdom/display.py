@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+vdom.display
+~~~~~~~~~~~~
+
+Keep a displayed VDOM tree up to date, sending the frontend only what changed.
+
+from vdom.display import UpdateScheduler, VDOMDisplay
+
+handle = VDOMDisplay(sparklines(events), scheduler=UpdateScheduler(max_frequency=20))
+for event in stream:
+    events.append(event)
+    handle.update(sparklines(events))
+
+"""
+import logging
+import threading
+import time
+import uuid
+
+from IPython import get_ipython
+from IPython.display import display, update_display
+
+from .core import VDOM, _handler_registry, _within_budget
+from .json_patch import make_patch
+
+log = logging.getLogger(__name__)
+
+# Target of the comm that carries patch messages, see docs/mimetype-spec.md
+COMM_TARGET = 'vdom.patch'
+
+
+class PatchChannel(object):
+    """A comm to the frontend for patch messages
+
+    Patches are only sent once the frontend has said it can apply them, by
+    sending ``{"ready": true}`` on the comm, and until the comm is closed.
+    Frontends that don't know the target never do, so they keep getting full
+    updates.
+    """
+
+    def __init__(self, comm):
+        self.comm = comm
+        self.ready = False
+        comm.on_msg(self._on_msg)
+        comm.on_close(self._on_close)
+
+    def _on_msg(self, msg):
+        if msg['content']['data'].get('ready'):
+            self.ready = True
+
+    def _on_close(self, msg):
+        self.ready = False
+
+    def send(self, display_id, patch):
+        self.comm.send({'displayId': display_id, 'patch': patch})
+
+
+_channel = None
+
+
+def _shared_channel():
+    """The patch channel of the running kernel, opened on first use, or None outside a kernel"""
+    global _channel
+    if _channel is None:
+        shell = get_ipython()
+        if shell is None or getattr(shell, 'kernel', None) is None:
+            return None
+        try:
+            from comm import create_comm
+        except ImportError:
+            try:
+                from ipykernel.comm import Comm as create_comm
+            except ImportError:
+                return None
+        _channel = PatchChannel(create_comm(target_name=COMM_TARGET))
+    return _channel
+
+
+class VDOMDisplay(object):
+    """Display a VDOM tree, then update it in place by sending what changed
+
+    ``update(tree)`` does nothing if the tree didn't change. Otherwise, when
+    the frontend can apply patches, it sends a JSON Patch (see
+    ``vdom.make_patch``) from the tree shown last over a comm. It falls back to
+    a full ``update_display`` when there is no such frontend, when the root
+    element was replaced, when the patch has more than
+    ``max_patch_operations`` operations and when either tree is larger than
+    the display budget (``VDOM.display_max_nodes`` and
+    ``VDOM.display_max_bytes``), as the frontend only has part of it.
+
+    Patches only change what the frontend shows: call ``sync()`` once updates
+    are done for the saved notebook to have the final tree too.
+
+    With a scheduler (see UpdateScheduler), updates are coalesced and sent
+    from its thread instead.
+
+    The ids of event handlers are scoped by display id, so that handles
+    showing the same component don't share them.
+    """
+
+    max_patch_operations = 1000
+
+    def __init__(self, tree, display_id=None, channel=None, scheduler=None):
+        self.display_id = display_id or uuid.uuid4().hex
+        self.tree = tree
+        self.channel = channel if channel is not None else _shared_channel()
+        self.scheduler = scheduler
+        # Whether the frontend was sent patches since the last full display
+        self.patched = False
+        # Whether the tree shown last fits in the display budget
+        self.within_budget = _within_display_budget(tree)
+        with _handler_registry.scope(self.display_id):
+            display(tree, display_id=self.display_id)
+
+    def update(self, tree):
+        """Show tree instead of the tree shown last, through the scheduler if there is one"""
+        if self.scheduler is None:
+            self.send(tree)
+        else:
+            self.scheduler.submit(self, tree)
+
+    def send(self, tree):
+        """Show tree instead of the tree shown last right away, sending as little as possible"""
+        if tree is self.tree:
+            return
+        channel = self.channel
+        patchable = channel is not None and channel.ready
+        if not (patchable and self.within_budget and _within_display_budget(tree)):
+            if tree != self.tree:
+                self._update_display(tree)
+            return
+        with _handler_registry.scope(self.display_id):
+            patch = make_patch(self.tree, tree)
+        if not patch:
+            self.tree = tree
+        elif len(patch) > self.max_patch_operations or patch[0]['path'] == '':
+            self._update_display(tree)
+        else:
+            channel.send(self.display_id, patch)
+            self.tree = tree
+            self.patched = True
+
+    def sync(self):
+        """Send the current tree in full if only patches were sent since the last full display"""
+        if self.patched:
+            self._update_display(self.tree)
+
+    def _update_display(self, tree):
+        with _handler_registry.scope(self.display_id):
+            update_display(tree, display_id=self.display_id)
+        self.tree = tree
+        self.patched = False
+        self.within_budget = _within_display_budget(tree)
+
+
+def _within_display_budget(tree):
+    if not isinstance(tree, VDOM):
+        return True
+    return _within_budget(tree, tree.display_max_nodes, tree.display_max_bytes)
+
+
+class UpdateScheduler(object):
+    """Coalesce display updates and send them at most max_frequency times a second
+
+    ``submit(handle, tree)`` only records tree as the latest for the handle's
+    display id. A background thread, started on first use, sends the latest
+    tree of every display that has one with ``handle.send``, then waits
+    ``1 / max_frequency`` seconds before sending again, so the last tree
+    submitted is always delivered, at most that long after.
+
+    Inside IPython, the scheduler also flushes after every cell, and calls
+    ``sync()`` on the handles it updated during the cell, so the saved
+    notebook has their final trees. ``flush()`` does the same on demand and
+    ``close()`` flushes and stops the thread.
+    """
+
+    def __init__(self, max_frequency=20):
+        self.interval = 1.0 / max_frequency
+        # Latest tree by display id, with its handle
+        self._pending = {}
+        self._condition = threading.Condition()
+        # Held while sending, so updates to a display always go out in order
+        self._sending = threading.Lock()
+        self._updated = {}
+        self._thread = None
+        self._closed = False
+        shell = get_ipython()
+        if shell is not None:
+            shell.events.register('post_run_cell', self._on_cell_done)
+
+    def submit(self, handle, tree):
+        with self._condition:
+            if self._closed:
+                raise ValueError('This scheduler was closed')
+            self._pending[handle.display_id] = (handle, tree)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='vdom-updates', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def flush(self):
+        """Send every pending update now, then sync the displays updated since the last flush"""
+        self._send_pending()
+        with self._sending:
+            updated, self._updated = self._updated, {}
+            for handle in updated.values():
+                handle.sync()
+
+    def close(self):
+        """Flush, then stop the background thread"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        shell = get_ipython()
+        if shell is not None and self._on_cell_done in shell.events.callbacks['post_run_cell']:
+            shell.events.unregister('post_run_cell', self._on_cell_done)
+
+    def _on_cell_done(self, result=None):
+        self.flush()
+
+    def _send_pending(self):
+        with self._sending:
+            with self._condition:
+                pending, self._pending = self._pending, {}
+            for handle, tree in pending.values():
+                try:
+                    handle.send(tree)
+                except Exception:
+                    log.exception('Failed to update display %s', handle.display_id)
+                self._updated[handle.display_id] = handle
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+            self._send_pending()
+            time.sleep(self.interval)
@@ -1,46 +1,44 @@
-from collections import OrderedDict
-
-
-class FrozenDict(OrderedDict):
+class FrozenDict(dict):
     """
-    Immutable ordered dictionary subclass
+    Immutable dictionary subclass
 
     Once constructed, dictionary can not be mutated without
     internal python hacks. Useful for enforcing invariants,
     but not useful for securing anything!
 
-    Uses an OrderedDict as base, to preserve ordering when
-    making outputs.
+    Builds on a plain dict, which preserves insertion ordering when
+    making outputs and is far more compact than an OrderedDict. All
+    empty FrozenDicts are the same object.
     """
 
-    def __init__(self, *args, **kwargs):
-        self.frozen = False
-        super(FrozenDict, self).__init__(*args, **kwargs)
-        self.frozen = True
+    __slots__ = ()
 
-    def __readonly__(self, func, *args, **kwargs):
-        if self.frozen:
-            raise ValueError("Can not modify FrozenDict")
-        else:
-            return func(*args, **kwargs)
+    # Kept for backwards compatibility, a FrozenDict is always frozen
+    frozen = True
 
-    def __setitem__(self, *args, **kwargs):
-        return self.__readonly__(super(FrozenDict, self).__setitem__, *args, **kwargs)
+    def __new__(cls, *args, **kwargs):
+        if cls is FrozenDict and not args and not kwargs and _EMPTY is not None:
+            return _EMPTY
+        return super(FrozenDict, cls).__new__(cls)
 
-    def __delitem__(self, *args, **kwargs):
-        return self.__readonly__(super(FrozenDict, self).__delitem__, *args, **kwargs)
+    def __readonly__(self, *args, **kwargs):
+        raise ValueError("Can not modify FrozenDict")
 
-    def pop(self, *args, **kwargs):
-        return self.__readonly__(super(FrozenDict, self).pop, *args, **kwargs)
+    __setitem__ = __readonly__
+    __delitem__ = __readonly__
+    __ior__ = __readonly__
+    pop = __readonly__
+    popitem = __readonly__
+    clear = __readonly__
+    update = __readonly__
+    setdefault = __readonly__
 
-    def popitem(self, *args, **kwargs):
-        return self.__readonly__(super(FrozenDict, self).popitem, *args, **kwargs)
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
 
-    def clear(self, *args, **kwargs):
-        return self.__readonly__(super(FrozenDict, self).clear, *args, **kwargs)
+    def __repr__(self):
+        return 'FrozenDict({})'.format(dict.__repr__(self))
 
-    def update(self, *args, **kwargs):
-        return self.__readonly__(super(FrozenDict, self).update, *args, **kwargs)
 
-    def setdefault(self, *args, **kwargs):
-        return self.__readonly__(super(FrozenDict, self).setdefault, *args, **kwargs)
+_EMPTY = None
+_EMPTY = FrozenDict()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+vdom.json_patch
+~~~~~~~~~~~~~~~
+
+Express the difference between two VDOM trees as a JSON Patch (RFC 6902)
+against their ``to_dict()`` documents, and apply such patches to trees.
+
+from vdom import apply_patch, make_patch
+
+patch = make_patch(old, new)
+apply_patch(old, patch) == new
+
+"""
+from .core import VDOM, _check_style, _freeze, _root_path, _segment, _tree_dict
+from .diffing import (
+    REMOVED,
+    Insert,
+    Move,
+    Remove,
+    Replace,
+    ReplaceAttribute,
+    ReplaceText,
+    _Patcher,
+    diff,
+)
+
+
+def make_patch(old, new):
+    """Return a JSON Patch turning ``old.to_dict()`` into ``new.to_dict()``
+
+    The patch is a list of operations, as dicts ready for ``json.dumps``,
+    computed by ``diff``, so it is as small as that diff. Paths go through
+    ``children`` and ``attributes``; the style of an element is at
+    ``attributes/style``.
+    """
+    patch = []
+    for op in diff(old, new):
+        kind = type(op)
+        if kind is ReplaceAttribute:
+            path = _pointer(op.path) + '/attributes/' + _escape(op.name)
+            if op.value is REMOVED:
+                patch.append({'op': 'remove', 'path': path})
+            else:
+                value = dict(op.value) if op.name == 'style' else op.value
+                patch.append({'op': 'add', 'path': path, 'value': value})
+        elif kind is Insert:
+            value = _value(op.node, new, op.path)
+            patch.append({'op': 'add', 'path': _pointer(op.path), 'value': value})
+        elif kind is Remove:
+            patch.append({'op': 'remove', 'path': _pointer(op.path)})
+        elif kind is Move:
+            patch.append({'op': 'move', 'from': _pointer(op.from_path), 'path': _pointer(op.path)})
+        elif kind is Replace:
+            value = _value(op.node, new, op.path)
+            patch.append({'op': 'replace', 'path': _pointer(op.path), 'value': value})
+        elif kind is ReplaceText:
+            patch.append({'op': 'replace', 'path': _pointer(op.path), 'value': op.text})
+    return patch
+
+
+def apply_patch(tree, patch):
+    """Apply a JSON Patch against the ``to_dict()`` document of tree, returning the new tree
+
+    Every subtree the patch doesn't touch is shared with tree. Patches may
+    address elements and texts through ``children``, attributes through
+    ``attributes`` and style properties through ``attributes/style``; other
+    paths raise ValueError, as does a failed ``test`` operation. Elements
+    added as dicts are validated against ``VDOM_SCHEMA``.
+    """
+    patcher = _Patcher(tree)
+    for operation in patch:
+        op = operation['op']
+        if op == 'test':
+            if _read(patcher, _target(patcher, operation['path'])) != operation['value']:
+                raise ValueError('JSON Patch test failed at {!r}'.format(operation['path']))
+            continue
+        target = _target(patcher, operation['path'], op in ('add', 'move', 'copy'))
+        if op in ('move', 'copy'):
+            source = _target(patcher, operation['from'])
+            value = _read(patcher, source)
+            if op == 'move':
+                _remove(patcher, source)
+                # Moving within the same children, the target index counts without the source
+                target = _target(patcher, operation['path'], True)
+        elif op in ('add', 'replace'):
+            value = operation['value']
+        elif op == 'remove':
+            _remove(patcher, target)
+            continue
+        else:
+            raise ValueError('Unknown JSON Patch operation: {!r}'.format(op))
+        _write(patcher, target, value, insert=op != 'replace')
+    return patcher.tree()
+
+
+def _escape(token):
+    return token.replace('~', '~0').replace('/', '~1')
+
+
+def _pointer(path):
+    return ''.join('/children/{}'.format(index) for index in path)
+
+
+def _value(node, root, path):
+    """The document of node, at path in the tree root, which its event handler ids depend on"""
+    if not isinstance(node, VDOM):
+        return node
+    segments = list(_root_path(root))
+    for index in path:
+        root = root.children[index]
+        segments.append(_segment(index, root))
+    return _tree_dict(node, path=tuple(segments))
+
+
+def _target(patcher, pointer, insert=False):
+    """Parse a JSON pointer into the document of a tree
+
+    Returns ``('node', path)``, ``('attribute', path, name)`` or
+    ``('style', path, name)``. An index of ``-`` in an insertion means after
+    the last child.
+    """
+    if pointer == '':
+        return ('node', ())
+    tokens = [t.replace('~1', '/').replace('~0', '~') for t in pointer.split('/')[1:]]
+    path = ()
+    while len(tokens) >= 2 and tokens[0] == 'children':
+        index = tokens[1]
+        if index == '-' and insert and len(tokens) == 2:
+            index = len(patcher.node(path).children)
+        elif not index.isdigit():
+            raise ValueError('Invalid child index in JSON Patch path {!r}'.format(pointer))
+        path += (int(index),)
+        tokens = tokens[2:]
+    if not tokens:
+        return ('node', path)
+    if len(tokens) == 2 and tokens[0] == 'attributes':
+        return ('attribute', path, tokens[1])
+    if len(tokens) == 3 and tokens[:2] == ['attributes', 'style']:
+        return ('style', path, tokens[2])
+    raise ValueError('Unsupported JSON Patch path {!r}'.format(pointer))
+
+
+def _read(patcher, target):
+    if target[0] == 'node':
+        return _value(patcher.node(target[1]), patcher.root, target[1])
+    element = patcher.node(target[1])
+    if target[0] == 'style':
+        return element.style[target[2]]
+    if target[2] == 'style' and element.style:
+        return dict(element.style)
+    return element.attributes[target[2]]
+
+
+def _remove(patcher, target):
+    if target[0] == 'node':
+        if target[1] == ():
+            raise ValueError('The root element of a tree can not be removed')
+        patcher.apply(Remove(target[1]))
+    elif target[0] == 'attribute':
+        patcher.apply(ReplaceAttribute(target[1], target[2], REMOVED))
+    else:
+        _set_style(patcher, target, REMOVED)
+
+
+def _write(patcher, target, value, insert):
+    if target[0] == 'node':
+        if isinstance(value, dict):
+            value = VDOM.from_dict(value)
+        elif not isinstance(value, str):
+            raise ValueError('Children must be VDOM elements or strings')
+        if insert and target[1] != ():
+            patcher.apply(Insert(target[1], value))
+        else:
+            patcher.apply(Replace(target[1], value))
+    elif target[0] == 'attribute' and target[2] == 'style':
+        style = _freeze(value)
+        _check_style(style)
+        patcher.apply(ReplaceAttribute(target[1], 'style', style or REMOVED))
+    elif target[0] == 'attribute':
+        patcher.apply(ReplaceAttribute(target[1], target[2], value))
+    else:
+        _set_style(patcher, target, value)
+
+
+def _set_style(patcher, target, value):
+    style = dict(patcher.node(target[1]).style)
+    if value is REMOVED:
+        del style[target[2]]
+    else:
+        style[target[2]] = value
+    style = _freeze(style)
+    _check_style(style)
+    patcher.apply(ReplaceAttribute(target[1], 'style', style or REMOVED))
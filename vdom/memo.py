@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+vdom.memo
+~~~~~~~~~
+
+Memoize components, so re-rendering with unchanged inputs reuses the tree
+built last time.
+
+from vdom.helpers import div, p
+from vdom.memo import memo
+
+@memo(maxsize=1024)
+def widget(title, value):
+    return div(p(title), p(str(value)))
+
+"""
+import functools
+import threading
+from collections import OrderedDict, namedtuple
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Separates positional from keyword arguments in cache keys
+_KWARGS = object()
+
+
+def memo(component=None, maxsize=128):
+    """Cache the trees a component returns, keyed by its arguments
+
+    VDOM trees are immutable, so a component called again with the same
+    arguments can hand back the very same tree. Arguments are compared by
+    value and type, so ``1``, ``1.0`` and ``True`` are different keys. VDOM
+    arguments are compared structurally through their cached hash. Calls with
+    unhashable arguments are passed straight through to the component.
+
+    The least recently used entries are evicted once there are more than
+    ``maxsize`` of them. The wrapped component gains ``cache_info()`` and
+    ``cache_clear()``, like ``functools.lru_cache``.
+
+    Examples:
+        >>> @memo
+        ... def badge(label):
+        ...     return span(label, style={'borderRadius': '4px'})
+        >>> badge('new') is badge('new')
+        True
+    """
+    if component is None:
+        return functools.partial(memo, maxsize=maxsize)
+
+    cache = OrderedDict()
+    lock = threading.Lock()
+    stats = [0, 0]  # hits, misses
+
+    @functools.wraps(component)
+    def wrapper(*args, **kwargs):
+        key = args + tuple(type(arg) for arg in args)
+        if kwargs:
+            items = tuple(sorted(kwargs.items()))
+            key += (_KWARGS,) + items + tuple(type(v) for _, v in items)
+        try:
+            with lock:
+                tree = cache[key]
+                cache.move_to_end(key)
+                stats[0] += 1
+            return tree
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable arguments can't be cached
+            with lock:
+                stats[1] += 1
+            return component(*args, **kwargs)
+
+        tree = component(*args, **kwargs)
+        with lock:
+            stats[1] += 1
+            cache[key] = tree
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+        return tree
+
+    def cache_info():
+        with lock:
+            return CacheInfo(stats[0], stats[1], maxsize, len(cache))
+
+    def cache_clear():
+        with lock:
+            cache.clear()
+            stats[:] = [0, 0]
+
+    wrapper.cache_info = cache_info
+    wrapper.cache_clear = cache_clear
+    return wrapper
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+vdom.template
+~~~~~~~~~~~~~
+
+Compile components with a static structure into templates that render by
+filling in holes instead of rebuilding and re-serializing every element.
+
+from vdom.helpers import meter, p, span
+from vdom.template import template
+
+@template
+def happiness(level, smiley):
+    return span(
+        p('Happiness ', smiley),
+        meter(level, min=0, low=25, high=75, optimum=90, max=100, value=level),
+    )
+
+happiness(96, '😃')
+
+"""
+import functools
+import inspect
+import json
+import re
+
+from .core import VDOM, _escape, _freeze, _mimebundle, _summary
+
+# Holes are marked in the compiled tree with tokens no real text contains.
+# Text, style values and strings built from arguments use _TEXT; attribute
+# values that are exactly an argument use _VALUE, since those keep their type.
+_TEXT = '\x00hole{}\x00'
+_VALUE = '\x01hole{}\x01'
+_TEXT_RE = re.compile('\x00hole(\\d+)\x00')
+_VALUE_RE = re.compile('\x01hole(\\d+)\x01')
+_JSON_RE = re.compile(r'\\u0000hole(\d+)\\u0000|"\\u0001hole(\d+)\\u0001"')
+_HTML_RE = re.compile('\x00hole(\\d+)\x00| ([^ =]+)="\x01hole(\\d+)\x01"')
+
+
+class Hole(str):
+    """Stand-in for an argument while a template's component is being compiled"""
+
+    __slots__ = ['index']
+
+    def __new__(cls, index):
+        hole = super(Hole, cls).__new__(cls, _TEXT.format(index))
+        hole.index = index
+        return hole
+
+
+def template(component):
+    """Compile a component into a Template
+
+    The component is called once, with a placeholder for each of its
+    arguments, and the resulting tree is kept along with its JSON and HTML
+    split into static fragments around the holes. Every call to the template
+    then only fills in the holes.
+
+    Arguments may be used as text children, attribute values or style values,
+    or formatted into strings, but the structure of the tree must not depend on
+    them: the component can't branch on, compute with or iterate over its
+    arguments.
+
+    Examples:
+        >>> @template
+        ... def greeting(name, tone):
+        ...     return p('Hello ', name, title=tone, style={'color': tone})
+        >>> greeting('world', 'blue').to_html()
+        '<p style="color: blue" title="blue">Hello world</p>'
+    """
+    return Template(component)
+
+
+class Template(object):
+    """A component compiled ahead of time into static fragments and holes"""
+
+    def __init__(self, component):
+        functools.update_wrapper(self, component)
+        self.signature = inspect.signature(component)
+        for parameter in self.signature.parameters.values():
+            if parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+                raise ValueError('Templates need named arguments, not *args or **kwargs')
+
+        holes = [Hole(i) for i in range(len(self.signature.parameters))]
+        tree = component(*holes)
+        if not isinstance(tree, VDOM):
+            raise TypeError('A template component must return a VDOM element')
+        self.tree = _mark_values(tree)
+        # Static fragments are strings; holes are (index, None) for text and
+        # (index, key) for attribute values, key being True in JSON
+        self.json_parts = _split(
+            _JSON_RE,
+            self.tree.to_json(),
+            lambda m: (int(m.group(1)), None) if m.group(1) else (int(m.group(2)), True),
+        )
+        self.html_parts = _split(
+            _HTML_RE,
+            self.tree.to_html(),
+            lambda m: (int(m.group(1)), None) if m.group(1) else (int(m.group(3)), m.group(2)),
+        )
+
+    def __call__(self, *args, **kwargs):
+        if not kwargs and len(args) == len(self.signature.parameters):
+            values = args
+        else:
+            bound = self.signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            values = tuple(bound.arguments.values())
+        for value in values:
+            if isinstance(value, VDOM):
+                raise TypeError('Template holes take text and attribute values, not elements')
+        return Rendered(self, values)
+
+
+class Rendered(object):
+    """One rendering of a Template, serialized on demand from its fragments"""
+
+    __slots__ = ['template', 'values']
+
+    def __init__(self, template, values):
+        self.template = template
+        self.values = values
+
+    def to_json(self):
+        values = self.values
+        out = []
+        for part in self.template.json_parts:
+            if type(part) is str:
+                out.append(part)
+            elif part[1] is None:
+                # Inside a JSON string already, so only its contents
+                out.append(json.dumps(str(values[part[0]]))[1:-1])
+            else:
+                out.append(json.dumps(values[part[0]]))
+        return ''.join(out)
+
+    def to_dict(self):
+        return json.loads(self.to_json())
+
+    def to_html(self):
+        values = self.values
+        out = []
+        for part in self.template.html_parts:
+            if type(part) is str:
+                out.append(part)
+            elif part[1] is None:
+                out.append(_escape(str(values[part[0]])))
+            else:
+                value = values[part[0]]
+                if isinstance(value, (str, bytes)):
+                    out.append(' {key}="{value}"'.format(key=part[1], value=_escape(value)))
+                elif isinstance(value, bool) and value:
+                    out.append(' {key}'.format(key=part[1]))
+        return ''.join(out)
+
+    def to_vdom(self):
+        """Build the full VDOM tree, sharing every subtree without holes"""
+        return _fill(self.template.tree, self.values)
+
+    def _repr_html_(self):
+        # Like VDOM._repr_html_, only when the bundle would include it anyway
+        return self.to_html() if VDOM.mimebundle_html else None
+
+    def _repr_mimebundle_(self, include=None, exclude=None, **kwargs):
+        representations = {
+            'application/vdom.v1+json': self.to_dict,
+            'text/plain': lambda: _summary([self.to_html()], VDOM.text_summary_length),
+        }
+        if VDOM.mimebundle_html or (include and 'text/html' in include):
+            representations['text/html'] = self.to_html
+        return _mimebundle(representations, include, exclude)
+
+
+def _split(pattern, text, hole):
+    """Split text into static strings and hole(match) for every hole in between"""
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(text[position : match.start()])
+        parts.append(hole(match))
+        position = match.end()
+    parts.append(text[position:])
+    return [part for part in parts if part != '']
+
+
+def _map_tree(node, text, value):
+    """Rebuild node with text(s) applied to children, style values and strings in
+    attributes, and value(v) applied to attribute values that are holes
+    themselves; returns node unchanged if nothing inside it changed"""
+    children = tuple(
+        _map_tree(c, text, value) if isinstance(c, VDOM) else text(c) for c in node.children
+    )
+    attributes = {k: value(v) for k, v in node.attributes.items()}
+    style = {k: text(v) for k, v in node.style.items()}
+    unchanged = all(a is b for a, b in zip(children, node.children))
+    unchanged = unchanged and all(attributes[k] is v for k, v in node.attributes.items())
+    if unchanged and all(style[k] is v for k, v in node.style.items()):
+        return node
+    return VDOM._trusted(
+        node.tag_name,
+        _freeze(attributes),
+        _freeze(style),
+        children,
+        node.key,
+        node.event_handlers,
+    )
+
+
+def _identity(value):
+    return value
+
+
+def _mark_values(tree):
+    def value(v):
+        if isinstance(v, Hole):
+            return _VALUE.format(v.index)
+        return v
+
+    return _map_tree(tree, _identity, value)
+
+
+def _fill(tree, values):
+    def text(s):
+        if isinstance(s, str) and '\x00' in s:
+            return _TEXT_RE.sub(lambda m: str(values[int(m.group(1))]), s)
+        return s
+
+    def value(v):
+        if isinstance(v, str) and '\x01' in v:
+            return values[int(_VALUE_RE.match(v).group(1))]
+        return text(v)
+
+    return _map_tree(tree, text, value)
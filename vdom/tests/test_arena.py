@@ -0,0 +1,71 @@
+from ..arena import Arena
+from ..helpers import b, button, div, input_, p, table, td, tr
+
+
+def _sample():
+    return div(
+        p('Hello <world>', b('bold', title='"quoted"'), '!', key='first'),
+        input_(disabled=True, hidden=False, value='x'),
+        table(
+            [tr([td(str(i * j), style={'textAlign': 'right'}) for j in range(3)]) for i in range(3)]
+        ),
+        p('Hello <world>', b('bold', title='"quoted"'), '!', key='first'),
+        style={'backgroundColor': 'pink'},
+        title='sample',
+    )
+
+
+def test_round_trip():
+    tree = _sample()
+    arena = Arena.from_vdom(tree)
+    assert len(arena) == 34
+    assert arena.to_vdom() == tree
+
+
+def test_renderers_match_vdom():
+    tree = _sample()
+    arena = Arena.from_vdom(tree)
+    assert arena.to_dict() == tree.to_dict()
+    assert arena.to_json() == tree.to_json()
+    assert arena.to_html() == tree.to_html()
+
+
+def test_event_handlers_match_vdom():
+    tree = div([button(str(i), onClick=lambda event: None) for i in range(3)])
+    arena = Arena.from_vdom(tree)
+    assert arena.to_dict() == tree.to_dict()
+    assert arena.to_json() == tree.to_json()
+
+
+def test_records_keep_value_types():
+    tree = div(input_(checked=True), input_(checked=1), input_(value=1.0), input_(value=1))
+    arena = Arena.from_vdom(tree)
+    assert arena.to_html() == tree.to_html()
+    assert arena.to_json() == tree.to_json()
+    assert len(arena.records) == 5
+
+
+def test_tables_are_deduplicated():
+    arena = Arena.from_vdom(_sample())
+    assert arena.tag_names == ['div', 'p', 'b', 'input', 'table', 'tr', 'td']
+    # bare elements, div, p, b, input, and one shared record for every styled td
+    assert len(arena.records) == 6
+    assert arena.texts.count('Hello <world>') == 1
+
+
+def test_layout():
+    arena = Arena.from_vdom(div(p('a', b('b')), 'c'))
+    assert list(arena.tags) == [0, 1, -1, 2, -1, -1]
+    assert list(arena.parents) == [-1, 0, 1, 1, 3, 0]
+    assert list(arena.ends) == [6, 5, 3, 5, 5, 6]
+    assert list(arena._children(0)) == [1, 5]
+
+
+def test_deep_tree():
+    depth = 10000
+    tree = p('leaf')
+    for _ in range(depth):
+        tree = div(tree)
+    arena = Arena.from_vdom(tree)
+    assert arena.to_html() == '<div>' * depth + '<p>leaf</p>' + '</div>' * depth
+    assert arena.to_vdom() == tree
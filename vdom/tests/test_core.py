@@ -1,22 +1,32 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import copy
+import gc
+import gzip
 import io
 import json
 import os
+import pickle
 
 import pytest
-from jsonschema import ValidationError
+from IPython.core.formatters import DisplayFormatter
+from jsonschema import Draft4Validator, SchemaError, ValidationError, validate
 
+from .. import core
+from ..arena import Arena
 from ..core import (
     VDOM,
     convert_style_key,
     create_component,
     create_element,
+    disable_interning,
+    enable_interning,
     eventHandler,
     to_json,
 )
-from ..helpers import b, button, div, h1, img, p
+from ..frozendict import FrozenDict
+from ..helpers import b, button, div, h1, img, input_, p
 
 _vdom_schema_file_path = os.path.join(
     os.path.dirname(__file__), "..", "schemas", "vdom_schema_v1.json"
@@ -42,6 +52,21 @@ def test_to_html_escaping():
     )
 
 
+def test_to_html_mixed():
+    el = div(
+        p('a & b', style={'fontSize': '12px', 'color': 'red'}, title='"quoted"', hidden=True),
+        'between',
+        img(src='x.png', hidden=False),
+        p(b('bold'), '<i>'),
+    )
+    assert el.to_html() == (
+        '<div>'
+        '<p style="color: red; font-size: 12px" hidden title="&quot;quoted&quot;">a &amp; b</p>'
+        'between<img src="x.png"></img><p><b>bold</b>&lt;i&gt;</p>'
+        '</div>'
+    )
+
+
 def test_css():
     el = div(
         p('Hello world'),
@@ -75,13 +100,15 @@ def test_event_handler_normal_function():
         print(event)
 
     el = button('click me', onClick=handle_click)
+    handler_id = el.to_dict()['eventHandlers']['onClick']['hash']
 
+    assert core._handler_registry.get(handler_id) is handle_click
     assert el.to_html() == '<button>click me</button>'
     assert el.to_dict() == {
         'attributes': {},
         'eventHandlers': {
             'onClick': {
-                'hash': hash(handle_click),
+                'hash': handler_id,
                 'stopPropagation': False,
                 'preventDefault': False,
             },
@@ -103,12 +130,14 @@ def test_event_handler_decorator():
     }
 
     el = button('click me', onClick=handle_click)
+    handler_id = el.to_dict()['eventHandlers']['onClick']['hash']
 
+    assert core._handler_registry.get(handler_id) is handle_click
     assert el.to_dict() == {
         'attributes': {},
         'eventHandlers': {
             'onClick': {
-                'hash': hash(handle_click),
+                'hash': handler_id,
                 'stopPropagation': True,
                 'preventDefault': True,
             },
@@ -118,6 +147,131 @@ def test_event_handler_decorator():
     }
 
 
+def counter(count, key=None):
+    children = [
+        p(str(count)),
+        button('+', onClick=lambda event: count + 1),
+        button('-', onClick=lambda event: count - 1, onMouseOver=lambda event: None),
+    ]
+    return VDOM('div', children=children, key=key)
+
+
+def handler_ids(vdom_dict):
+    return [
+        handler['hash']
+        for child in vdom_dict['children']
+        for handler in child.get('eventHandlers', {}).values()
+    ]
+
+
+def test_event_handler_ids_stable_across_renders():
+    first, second = counter(0), counter(1)
+    ids = handler_ids(first.to_dict())
+    assert len(set(ids)) == 3
+    assert handler_ids(second.to_dict()) == ids
+    assert json.loads(second.to_json()) == second.to_dict()
+
+    # The ids point at the handlers serialized last
+    assert core._handler_registry.get(ids[0])(None) == 2
+    first.to_dict()
+    assert core._handler_registry.get(ids[0])(None) == 1
+
+    with core._handler_registry.scope('another display'):
+        assert set(handler_ids(first.to_dict())).isdisjoint(ids)
+
+    # Keyed elements keep their ids wherever they move
+    keyed = div(counter(0, key='a'), counter(0, key='b')).to_dict()
+    swapped = div(counter(0, key='b'), counter(0, key='a')).to_dict()
+    assert handler_ids(keyed['children'][0]) == handler_ids(swapped['children'][1])
+
+    # Separately displayed roots with different keys don't share ids either
+    first = counter(0, key='first')._repr_mimebundle_()['application/vdom.v1+json']
+    second = counter(0, key='second')._repr_mimebundle_()['application/vdom.v1+json']
+    assert set(handler_ids(first)).isdisjoint(handler_ids(second))
+    assert handler_ids(counter(1, key='first').to_dict()) == handler_ids(first)
+
+
+class CommManager(object):
+    def __init__(self):
+        self.targets = {}
+
+    def register_target(self, name, callback):
+        assert name not in self.targets
+        self.targets[name] = callback
+
+    def unregister_target(self, name, callback):
+        assert self.targets.pop(name) == callback
+
+
+class Comm(object):
+    def __init__(self):
+        self.sent = []
+
+    def on_msg(self, callback):
+        self.receive = callback
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+@pytest.fixture
+def comm_manager(monkeypatch):
+    """Serialize handlers into a new registry, in a fake kernel"""
+
+    class Shell(object):
+        class kernel(object):
+            comm_manager = CommManager()
+
+    monkeypatch.setattr(core, 'get_ipython', Shell)
+    monkeypatch.setattr(core, '_handler_registry', core._HandlerRegistry())
+    return Shell.kernel.comm_manager
+
+
+def test_event_handlers_registered_once(comm_manager):
+    ids = handler_ids(counter(0).to_dict())
+    handler_ids(counter(1).to_dict())
+    targets = comm_manager.targets
+    assert sorted(targets) == sorted(ids)
+
+    comm = Comm()
+    targets[ids[0]](comm, {'content': {'target_name': ids[0]}})
+    handler_ids(counter(5).to_dict())
+    comm.receive({'content': {'data': '{}'}})
+    assert comm.sent[-1] == 6
+
+
+def test_repeated_renders_keep_registry_size(comm_manager):
+    registry = core._handler_registry
+    for count in range(100):
+        el = counter(count)
+        el.validate(VDOM_SCHEMA)
+        el._repr_mimebundle_(include=['application/vdom.v1+json', 'text/html'])
+        el.to_json()
+        Arena.from_vdom(el).to_dict()
+    assert len(registry._handlers) == len(registry._registered) == 3
+    assert sorted(comm_manager.targets) == sorted(registry._handlers)
+    assert el.to_dict() == el.to_dict()
+
+
+def test_handler_registry_bounded(comm_manager):
+    registry = core._handler_registry
+    registry.maxsize = 4
+    first = handler_ids(counter(0, key='first').to_dict())
+    second = handler_ids(counter(0, key='second').to_dict())
+    # The handlers serialized least recently go first, with their comm targets
+    assert list(registry._handlers) == first[2:] + second
+    assert sorted(comm_manager.targets) == sorted(first[2:] + second)
+    assert registry.get(first[0]) is None
+
+
+def test_json_of_event_handlers_not_cached():
+    shared = div([p(str(i)) for i in range(core._FRAGMENT_MIN_PARTS)])
+    tree = div(shared, counter(0))
+    assert json.loads(tree.to_json()) == tree.to_dict()
+    assert shared._json is not None
+    assert tree._json is None and tree.children[1]._json is None
+
+
 def test_to_json():
     assert to_json({'tagName': 'h1', 'attributes': {'data-test': True}, 'children': []}) == {
         'tagName': 'h1',
@@ -264,6 +418,20 @@ def test_immutable_attributes():
         comp.attributes['class'] = 'something'
 
 
+@pytest.mark.parametrize(
+    'copier', [copy.copy, copy.deepcopy, lambda el: pickle.loads(pickle.dumps(el))]
+)
+def test_copy_and_pickle(copier):
+    el = div(h1('hello', title=1), style={'color': 'red'}, key='a')
+    el.to_json(), el.to_html()
+    copied = copier(el)
+    assert copied is not el and copied == el
+    assert copied._json is None and copied._html is None
+    assert copied.to_html() == el.to_html()
+    with pytest.raises(AttributeError):
+        copied.children = ()
+
+
 def test_invalid_children():
     with pytest.raises(ValueError):
         div(5)
@@ -272,3 +440,389 @@ def test_invalid_children():
 def test_convert_style_key():
     assert convert_style_key("backgroundColor") == "background-color"
     assert convert_style_key("preserveAspectRatio") == "preserve-aspect-ratio"
+    assert convert_style_key("backgroundColor") == "background-color"
+    assert convert_style_key.cache_info().hits >= 1
+
+
+def test_escape_fast_path():
+    text = 'nothing to escape here'
+    assert core._escape(text) is text
+    assert core._escape('a & b < "c" \'d\'') == 'a &amp; b &lt; &quot;c&quot; &#x27;d&#x27;'
+
+
+def test_trusted_matches_constructor():
+    el = VDOM._trusted(
+        'p',
+        FrozenDict([('title', 'x')]),
+        FrozenDict([('color', 'red')]),
+        ('Hello', b('world')),
+        None,
+        FrozenDict(),
+    )
+    assert (
+        el.to_dict() == VDOM('p', {'title': 'x'}, {'color': 'red'}, ['Hello', b('world')]).to_dict()
+    )
+    with pytest.raises(AttributeError):
+        el.tag_name = 'div'
+
+
+def test_from_dict_still_checks_children_and_style():
+    with pytest.raises(ValueError):
+        VDOM.from_dict({'tagName': 'div', 'attributes': {}, 'children': [None]})
+    with pytest.raises(ValueError):
+        VDOM.from_dict({'tagName': 'div', 'attributes': {'style': {'width': 5}}, 'children': []})
+
+
+def test_structural_equality_and_hash():
+    def build(title='something'):
+        return div(p('Hello', b('world'), title=title), style={'color': 'red'})
+
+    assert build() == build()
+    assert hash(build()) == hash(build())
+    assert build() != build(title='other')
+    assert build() != div(p('Hello', b('world'), title='something'))
+    assert div('Hello') != 'Hello'
+    assert len({build(), build(), build(title='other')}) == 2
+
+
+def test_structural_equality_unhashable_attributes():
+    el = div(data=['a', 'b'])
+    # Hashed by type only, equality tells them apart
+    assert hash(el) == hash(div(data=['a', 'b'])) == hash(div(data=['a']))
+    assert el == div(data=['a', 'b'])
+    assert el != div(data=['a'])
+
+
+def test_structural_equality_value_types():
+    for values in ((True, 1), (1, 1.0), (True, 1.0)):
+        first, second = (input_(checked=v) for v in values)
+        assert first != second
+        assert hash(first) != hash(second)
+        assert VDOM('div', key=values[0]) != VDOM('div', key=values[1])
+    assert input_(checked=True) == input_(checked=True)
+
+    enable_interning()
+    try:
+        kept = input_(checked=True)
+        assert input_(checked=1) is not kept
+        assert input_(checked=1).to_html() != kept.to_html()
+    finally:
+        disable_interning()
+
+
+def test_structural_hash_deep_tree():
+    def build():
+        el = p('leaf')
+        for _ in range(5000):
+            el = div(el)
+        return el
+
+    assert build() == build()
+    assert hash(build()) == hash(build())
+
+
+def test_interning():
+    enable_interning()
+    try:
+        first = div(p('Hello', title='x'), p('Hello', title='x'))
+        second = div(p('Hello', title='x'), p('Hello', title='x'))
+        assert first is second
+        assert first.children[0] is first.children[1]
+        assert div(p('Hello')) is not div(p('Goodbye'))
+        # Unhashable attributes are left alone
+        assert div(data=['a']) is not div(data=['a'])
+    finally:
+        disable_interning()
+    assert div(p('Hello')) is not div(p('Hello'))
+
+
+def test_interning_is_bounded_and_weak():
+    enable_interning(maxsize=1)
+    try:
+        kept = p('one')
+        assert p('two') is not p('two')
+        del kept
+        gc.collect()
+        assert p('three') is p('three')
+    finally:
+        disable_interning()
+
+
+def test_iter_json():
+    def build():
+        return div(
+            h1('Our Incredibly Declarative Example'),
+            p('Can you believe we wrote this ', b('in Python'), '?', style={'color': 'red'}),
+            img(src="https://media.giphy.com/media/xUPGcguWZHRC2HyBRS/giphy.gif"),
+            VDOM('ul', children=[VDOM('li', key=i, children=[str(i)]) for i in range(20)]),
+            '"quoted" ☃',
+        )
+
+    expected = json.dumps(build().to_dict())
+    assert ''.join(build().iter_json()) == expected
+    chunks = list(build().iter_json(chunk_size=100))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 100 for chunk in chunks[:-1])
+    assert ''.join(chunks) == expected
+
+    out = io.StringIO()
+    build().render_json_to(out)
+    assert out.getvalue() == expected
+
+
+def test_iter_html():
+    def build():
+        return div(
+            h1('Our Incredibly Declarative Example'),
+            p('Can you believe we wrote this ', b('in Python'), '?', style={'color': 'red'}),
+            VDOM(
+                'ul',
+                children=[
+                    VDOM('li', {'title': '<{}>'.format(i)}, children=[str(i)]) for i in range(20)
+                ],
+            ),
+            '"quoted" ☃',
+        )
+
+    expected = build().to_html()
+    assert ''.join(build().iter_html()) == expected
+    chunks = list(build().iter_html(chunk_size=100))
+    assert len(chunks) > 1
+    assert all(len(chunk) >= 100 for chunk in chunks[:-1])
+    assert ''.join(chunks) == expected
+
+    out = io.BytesIO()
+    with gzip.GzipFile(fileobj=out, mode='wb') as gz:
+        build().render_html_to(io.TextIOWrapper(gz, encoding='utf-8', write_through=True))
+    assert gzip.decompress(out.getvalue()).decode('utf-8') == expected
+
+
+def test_json_fragment_cache():
+    rows = [VDOM('li', key=i, children=[str(i)]) for i in range(40)]
+    unchanged = div(VDOM('ul', children=rows), p('footer'))
+    first = div(unchanged, p('one'))
+    assert first.to_json() == json.dumps(first.to_dict())
+    # The large list keeps its fragment, the small footer doesn't
+    assert unchanged.children[0]._json is not None
+    assert unchanged.children[1]._json is None
+    assert first.to_json() is first.to_json()
+
+    second = div(unchanged, p('two'))
+    assert second.to_json() == json.dumps(second.to_dict())
+    assert ''.join(second.iter_json()) == second.to_json()
+
+
+def nested_list(depth):
+    el = VDOM('ul', children=[VDOM('li', children=[str(i)]) for i in range(15)])
+    for _ in range(depth):
+        items = [VDOM('li', children=[str(i)]) for i in range(15)]
+        el = VDOM('ul', children=items + [VDOM('li', children=[el])])
+    return el
+
+
+def cached_length(root, attribute):
+    total = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        total += len(getattr(node, attribute) or '')
+        stack.extend(c for c in node.children if isinstance(c, VDOM))
+    return total
+
+
+def test_json_fragment_cache_stays_linear():
+    tree = nested_list(300)
+    encoded = tree.to_json()
+    assert json.loads(encoded) == tree.to_dict()
+    assert cached_length(tree, '_json') <= 3 * len(encoded)
+
+
+def test_html_fragment_cache():
+    rows = [VDOM('li', key=i, children=[str(i), b('<{}>'.format(i))]) for i in range(20)]
+    unchanged = div(VDOM('ul', children=rows), p('footer'))
+    first = div(unchanged, p('one'))
+    expected = ''.join(first.iter_html())
+    assert first.to_html() == expected
+    # The large list keeps its HTML, the small footer doesn't
+    assert unchanged.children[0]._html is not None
+    assert unchanged.children[1]._html is None
+    assert first.to_html() is first.to_html()
+
+    second = div(unchanged, p('two'))
+    assert second.to_html() == expected.replace('one', 'two')
+    assert ''.join(second.iter_html(chunk_size=10)) == second.to_html()
+
+
+def test_html_fragment_cache_stays_linear():
+    tree = nested_list(300)
+    rendered = tree.to_html()
+    assert rendered == ''.join(tree.iter_html())
+    assert cached_length(tree, '_html') <= 3 * len(rendered)
+
+
+def test_iter_json_deep_tree():
+    el = p('leaf')
+    for _ in range(10000):
+        el = div(el)
+    opening = '{"tagName": "div", "attributes": {}, "children": [' * 10000
+    leaf = '{"tagName": "p", "attributes": {}, "children": ["leaf"]}'
+    assert ''.join(el.iter_json()) == opening + leaf + ']}' * 10000
+
+
+def test_deep_tree_round_trip():
+    el = p('leaf')
+    for _ in range(10000):
+        el = div(el)
+    assert el.to_html() == '<div>' * 10000 + '<p>leaf</p>' + '</div>' * 10000
+
+    value = el.to_dict()
+    assert value['children'][0]['children'][0]['tagName'] == 'div'
+    assert VDOM.from_dict(value) == el
+    assert VDOM.from_dict(value, validate=False) == el
+
+
+def test_from_dict_validates_once(monkeypatch):
+    calls = []
+    original = core._validate
+
+    def counting_validate(instance, schema):
+        calls.append(instance)
+        return original(instance, schema)
+
+    nested = {'tagName': 'p', 'attributes': {}, 'children': ['leaf']}
+    for _ in range(20):
+        nested = {'tagName': 'div', 'attributes': {}, 'children': [nested, 'text']}
+    monkeypatch.setattr(core, '_validate', counting_validate)
+    el = VDOM.from_dict(nested)
+    assert len(calls) == 1
+    assert el.to_dict() == nested
+
+
+def test_from_dict_without_validation():
+    invalid = {'tagName': 'div', 'children': [{'tagName': 'p', 'children': ['x']}]}
+    with pytest.raises(ValidationError):
+        VDOM.from_dict(invalid)
+    assert VDOM.from_dict(invalid, validate=False) == div(p('x'))
+
+
+def test_validators_compiled_once_per_schema():
+    schema = {'type': 'object', 'required': ['tagName']}
+    validator = core._validator_for(schema)
+    assert core._validator_for(schema) is validator
+    # An equal but distinct schema gets its own validator
+    assert core._validator_for(dict(schema)) is not validator
+
+    div(p('x')).validate(schema)
+    with pytest.raises(ValidationError, match="didn't match the schema"):
+        to_json({'tagName': 'div'}, {'required': ['key']})
+    with pytest.raises(SchemaError):
+        div().validate({'type': 'not a type'})
+
+
+@pytest.mark.parametrize(
+    'value',
+    [
+        {'tagName': 'div', 'attributes': {}, 'children': []},
+        {'tagName': 'div', 'attributes': {}, 'children': None, 'extra': 1},
+        {'tagName': 'div', 'attributes': {}, 'children': 'text', 'key': 1.5},
+        {'tagName': 'div', 'attributes': {}, 'children': [[None, 'a']], 'key': None},
+        {
+            'tagName': 'div',
+            'attributes': {},
+            'children': {'tagName': 'p', 'attributes': {}, 'children': []},
+        },
+        {'tagName': 'div', 'attributes': {}, 'children': [], 'eventHandlers': {'onClick': 'x'}},
+        {'tagName': 'div', 'attributes': {}, 'children': [], 'key': True},
+        {'tagName': 'div', 'attributes': {}, 'children': [], 'key': []},
+        {'tagName': 'div', 'attributes': {}, 'children': [], 'eventHandlers': []},
+        {'tagName': 'div', 'attributes': {}, 'children': ()},
+        {'tagName': 'div', 'attributes': {}, 'children': [1]},
+        {'tagName': 'div', 'attributes': {}, 'children': [{'tagName': 'p', 'children': []}]},
+        {'tagName': 1, 'attributes': {}, 'children': []},
+        {'tagName': 'div', 'attributes': [], 'children': []},
+        {'tagName': 'div', 'children': []},
+        ['not', 'an', 'element'],
+        'text',
+        None,
+    ],
+)
+def test_fast_validator_matches_jsonschema(value):
+    validator = Draft4Validator(VDOM_SCHEMA)
+    assert core._is_vdom_element(value) == validator.is_valid(value)
+
+    # Rejections carry the same error as plain jsonschema validation
+    try:
+        validate(value, VDOM_SCHEMA, cls=Draft4Validator)
+    except ValidationError as e:
+        with pytest.raises(ValidationError) as info:
+            core._validate(value, core.VDOM_SCHEMA)
+        assert str(e) in str(info.value)
+    else:
+        core._validate(value, core.VDOM_SCHEMA)
+
+
+def test_repr_mimebundle(monkeypatch):
+    el = div([p('row {}'.format(i)) for i in range(200)])
+    bundle = el._repr_mimebundle_()
+    assert set(bundle) == {'application/vdom.v1+json', 'text/plain'}
+    assert bundle['application/vdom.v1+json'] == el.to_dict()
+    assert bundle['text/plain'] == el.to_html()[:500] + '…'
+
+    assert set(el._repr_mimebundle_(include=['application/vdom.v1+json'])) == {
+        'application/vdom.v1+json'
+    }
+    assert set(el._repr_mimebundle_(exclude=['application/vdom.v1+json'])) == {'text/plain'}
+    assert el._repr_mimebundle_(include=['text/html'])['text/html'] == el.to_html()
+
+    # IPython's formatter doesn't render the HTML either
+    data, _ = DisplayFormatter().format(el)
+    assert set(data) == {'application/vdom.v1+json', 'text/plain'}
+
+    monkeypatch.setattr(VDOM, 'mimebundle_html', True)
+    assert set(el._repr_mimebundle_()) == {'application/vdom.v1+json', 'text/plain', 'text/html'}
+    data, _ = DisplayFormatter().format(el)
+    assert data['text/html'] == el.to_html()
+    # Short trees are shown in full
+    assert p('short')._repr_mimebundle_()['text/plain'] == '<p>short</p>'
+
+
+def test_repr_mimebundle_budget(monkeypatch):
+    el = div(h1('Rows'), div([p('row {}'.format(i)) for i in range(100)]))
+    bundle = el._repr_mimebundle_(include=['application/vdom.v1+json'])
+    assert bundle['application/vdom.v1+json'] == el.to_dict()
+
+    monkeypatch.setattr(VDOM, 'display_max_nodes', 10)
+    value = el._repr_mimebundle_()['application/vdom.v1+json']
+    rows = value['children'][1]['children']
+    # div, h1 and its text, the rows div, then 3 rows with their text
+    assert [row['children'] for row in rows[:3]] == [['row 0'], ['row 1'], ['row 2']]
+    assert rows[3]['attributes'] == {'class': 'vdom-truncated'}
+    assert rows[3]['children'] == [
+        'Output truncated: this tree is larger than the display budget of 10 nodes'
+    ]
+    assert len(rows) == 4
+
+    monkeypatch.setattr(VDOM, 'display_max_nodes', None)
+    monkeypatch.setattr(VDOM, 'display_max_bytes', 1000)
+    value = el._repr_mimebundle_()['application/vdom.v1+json']
+    notice = value['children'][1]['children'][-1]
+    assert notice['children'][0].endswith('1000 bytes')
+    assert len(json.dumps(value)) < 1500
+
+
+def test_repr_html_budget(monkeypatch):
+    el = div(h1('Rows'), div([p('row {}'.format(i)) for i in range(100)]))
+    monkeypatch.setattr(VDOM, 'display_max_nodes', 10)
+    html = el._repr_mimebundle_(include=['text/html'])['text/html']
+    assert 'vdom-truncated' in html
+    assert 'row 2' in html and 'row 3' not in html
+
+    # The formatter's own _repr_html_ call is budgeted too
+    monkeypatch.setattr(VDOM, 'mimebundle_html', True)
+    data, _ = DisplayFormatter().format(el)
+    assert data['text/html'] == html
+    assert el._repr_html_() == html
+
+    # Trees within the budget are rendered in full
+    short = div(p('short'))
+    assert short._repr_mimebundle_()['text/html'] == short.to_html()
@@ -0,0 +1,208 @@
+import random
+
+import pytest
+
+from ..core import VDOM
+from ..diffing import (
+    REMOVED,
+    Insert,
+    Move,
+    Remove,
+    Replace,
+    ReplaceAttribute,
+    ReplaceText,
+    apply_diff,
+    diff,
+    reconcile,
+)
+from ..helpers import b, div, input_, li, p, span, ul
+
+
+def keyed_list(keys, label='item'):
+    return ul([VDOM('li', key=k, children=['{} {}'.format(label, k)]) for k in keys])
+
+
+def check(old, new):
+    ops = diff(old, new)
+    assert apply_diff(old, ops) == new
+    return ops
+
+
+def test_identical_trees():
+    shared = div(p('a'), p('b'))
+    assert diff(shared, shared) == []
+    assert diff(div(shared), div(shared)) == []
+    assert check(div(p('a')), div(p('a'))) == []
+
+
+def test_text_and_attributes():
+    old = div(p('Hello', title='a', hidden=True), style={'color': 'red'})
+    new = div(p('Goodbye', title='b', id='x'))
+    assert check(old, new) == [
+        ReplaceAttribute((), 'style', REMOVED),
+        ReplaceAttribute((0,), 'id', 'x'),
+        ReplaceAttribute((0,), 'title', 'b'),
+        ReplaceAttribute((0,), 'hidden', REMOVED),
+        ReplaceText((0, 0), 'Goodbye'),
+    ]
+    assert check(new, old)[0] == ReplaceAttribute((), 'style', old.style)
+
+
+def test_insert_and_remove():
+    assert check(div(p('a'), p('b')), div(p('a'))) == [Remove((1,))]
+    assert check(div(p('a')), div(p('a'), span('b'))) == [Insert((1,), span('b'))]
+    assert check(div(p('a'), 'text'), div(p('a'))) == [Remove((1,))]
+
+
+def test_keyed_children():
+    old = keyed_list([1, 2, 3, 4])
+    assert check(old, keyed_list([4, 1, 2, 3])) == [Move((3,), (0,))]
+    assert check(old, keyed_list([2, 3, 4, 1])) == [Move((0,), (3,))]
+    assert len(check(old, keyed_list([4, 3, 2, 1]))) == 3
+    assert check(old, keyed_list([1, 3, 4])) == [Remove((1,))]
+    assert check(old, keyed_list([1, 2, 5, 3, 4])) == [Insert((2,), keyed_list([5]).children[0])]
+
+
+def test_replaced_elements():
+    assert check(div(p('a')), span(p('a'))) == [Replace((), span(p('a')))]
+    assert check(div(p('a')), div(b('a'))) == [Remove((0,)), Insert((0,), b('a'))]
+    old = VDOM('div', children=[VDOM('p', key='x')])
+    new = VDOM('div', children=[VDOM('p', key='y')])
+    assert check(old, new) == [Remove((0,)), Insert((0,), VDOM('p', key='y'))]
+
+
+def test_unchanged_subtrees_are_shared():
+    rows = [li(str(i)) for i in range(100)]
+    old = div(ul(rows), p('footer'))
+    new = div(ul(rows[:50] + [li('new')] + rows[50:]), p('footer'))
+    ops = check(old, new)
+    assert len(ops) == 1
+    patched = apply_diff(old, ops)
+    assert patched.children[1] is old.children[1]
+    assert all(a is b for a, b in zip(patched.children[0].children[:50], rows))
+
+
+def test_shifted_children():
+    def bars(values):
+        return div([div(style={'height': '{}px'.format(v)}) for v in values])
+
+    values = [3, 1, 4, 1, 5, 9, 2, 6]
+    old = bars(values)
+    assert check(old, bars(values[1:])) == [Remove((0,))]
+    assert check(old, bars(values + [7])) == [Insert((8,), bars([7]).children[0])]
+    assert check(old, bars(values[:4] + values[5:])) == [Remove((4,))]
+    # The first bar is reused for the new last one
+    assert check(old, bars(values[1:] + [7])) == [
+        Move((0,), (7,)),
+        ReplaceAttribute((7,), 'style', bars([7]).children[0].style),
+    ]
+
+
+def test_unhashable_attributes():
+    old = div(p('a', data=[1]), p('b'))
+    assert check(old, div(p('a', data=[2]), p('b'))) == [ReplaceAttribute((0,), 'data', [2])]
+
+
+def test_attribute_value_types():
+    old = div(input_(checked=True, value=1))
+    assert check(old, div(input_(checked=1, value=1.0))) == [
+        ReplaceAttribute((0,), 'checked', 1),
+        ReplaceAttribute((0,), 'value', 1.0),
+    ]
+
+
+def test_shifted_event_handlers():
+    first, second = li(b('a', onClick=lambda event: 'a')), li(b('b', onClick=lambda event: 'b'))
+    # Elements without a key are serialized again when their index changes, for the ids
+    # of the handlers below them
+    old = ul(first, li('plain'))
+    assert check(old, ul(second, first, li('plain'))) == [
+        Insert((0,), second),
+        Replace((1,), first),
+    ]
+    keyed = ul(VDOM('li', children=[first], key='a'))
+    assert check(keyed, ul(second, keyed.children[0])) == [Insert((0,), second)]
+
+
+def test_deep_tree():
+    def chain(leaf):
+        el = leaf
+        for _ in range(5000):
+            el = div(el)
+        return el
+
+    ops = check(chain(p('old')), chain(p('new')))
+    assert ops == [ReplaceText((0,) * 5001, 'new')]
+
+
+def apply_steps(old_keys, new_keys, steps):
+    keys = list(old_keys)
+    for step in steps:
+        if step[0] == 'remove':
+            del keys[step[1]]
+        elif step[0] == 'move':
+            keys.insert(step[2], keys.pop(step[1]))
+        else:
+            keys.insert(step[1], new_keys[step[1]])
+    return keys
+
+
+def test_reconcile():
+    assert reconcile('abcd', 'abcd') == []
+    assert reconcile('abcd', 'dabe') == [('remove', 2), ('move', 2, 0), ('insert', 3)]
+    assert reconcile('', 'ab') == [('insert', 0), ('insert', 1)]
+    assert reconcile('ab', '') == [('remove', 1), ('remove', 0)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_reconcile_moves_as_little_as_possible(seed):
+    rng = random.Random(seed)
+    old_keys = rng.sample(range(1000), 200)
+    new_keys = rng.sample(old_keys, 150) + rng.sample(range(1000, 1100), 20)
+    rng.shuffle(new_keys)
+    steps = reconcile(old_keys, new_keys)
+    assert apply_steps(old_keys, new_keys, steps) == new_keys
+
+    # Brute force: the kept keys that don't move must be in order in both lists
+    kept = [k for k in old_keys if k in set(new_keys)]
+    order = [new_keys.index(k) for k in kept]
+    longest = [1] * len(order)
+    for i in range(len(order)):
+        for j in range(i):
+            if order[j] < order[i]:
+                longest[i] = max(longest[i], longest[j] + 1)
+    moves = [step for step in steps if step[0] == 'move']
+    assert len(moves) == len(kept) - max(longest)
+
+
+def test_reconcile_large_lists():
+    keys = list(range(20000))
+    new_keys = keys[::-1]
+    steps = reconcile(keys, new_keys)
+    assert len(steps) == len(keys) - 1
+    assert apply_steps(keys, new_keys, steps) == new_keys
+
+    new_keys = keys[1::2] + [-1] + keys[-2::-2]
+    steps = reconcile(keys, new_keys)
+    assert apply_steps(keys, new_keys, steps) == new_keys
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_trees(seed):
+    rng = random.Random(seed)
+
+    def tree(depth):
+        children = []
+        for _ in range(rng.randint(0, 5)):
+            kind = rng.random()
+            if kind < 0.3 or depth == 0:
+                children.append(rng.choice(['a', 'b', 'c']))
+            elif kind < 0.6:
+                children.append(VDOM('li', key=rng.randint(0, 6), children=[tree(depth - 1)]))
+            else:
+                tag = rng.choice([div, p, span])
+                children.append(tag(tree(depth - 1), title=rng.choice(['x', 'y'])))
+        return div(children)
+
+    for _ in range(10):
+        check(tree(3), tree(3))
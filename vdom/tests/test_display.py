@@ -0,0 +1,201 @@
+import time
+
+import pytest
+
+from .. import display as vdom_display
+from ..core import VDOM
+from ..display import PatchChannel, UpdateScheduler, VDOMDisplay
+from ..helpers import button, div, p
+
+
+class FakeComm(object):
+    def __init__(self):
+        self.sent = []
+
+    def on_msg(self, callback):
+        self.receive = callback
+
+    def on_close(self, callback):
+        self.close = callback
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+@pytest.fixture
+def displayed(monkeypatch):
+    """Record what goes out as (display or update, tree)"""
+    messages = []
+    monkeypatch.setattr(
+        vdom_display, 'display', lambda tree, display_id: messages.append(('display', tree))
+    )
+    monkeypatch.setattr(
+        vdom_display,
+        'update_display',
+        lambda tree, display_id: messages.append(('update', tree)),
+    )
+    return messages
+
+
+def bar(percent):
+    return div(p('{}%'.format(percent)), div(style={'width': '{}%'.format(percent)}))
+
+
+def test_full_updates_without_a_frontend(displayed):
+    handle = VDOMDisplay(bar(0), channel=None)
+    handle.update(bar(0))
+    handle.update(bar(1))
+    assert displayed == [('display', bar(0)), ('update', bar(1))]
+
+
+def test_patches_once_frontend_is_ready(displayed):
+    comm = FakeComm()
+    channel = PatchChannel(comm)
+    handle = VDOMDisplay(bar(0), display_id='progress', channel=channel)
+    handle.update(bar(1))
+    assert comm.sent == []
+
+    comm.receive({'content': {'data': {'ready': True}}})
+    handle.update(bar(2))
+    handle.update(bar(2))
+    assert comm.sent == [
+        {
+            'displayId': 'progress',
+            'patch': [
+                {'op': 'add', 'path': '/children/1/attributes/style', 'value': {'width': '2%'}},
+                {'op': 'replace', 'path': '/children/0/children/0', 'value': '2%'},
+            ],
+        }
+    ]
+    assert displayed == [('display', bar(0)), ('update', bar(1))]
+
+    # The stored output catches up on sync
+    handle.sync()
+    handle.sync()
+    assert displayed[2:] == [('update', bar(2))]
+
+    comm.close({})
+    handle.update(bar(3))
+    assert len(comm.sent) == 1
+    assert displayed[3:] == [('update', bar(3))]
+
+
+def test_falls_back_to_full_updates(displayed, monkeypatch):
+    comm = FakeComm()
+    channel = PatchChannel(comm)
+    comm.receive({'content': {'data': {'ready': True}}})
+    handle = VDOMDisplay(bar(0), channel=channel)
+
+    handle.update(VDOM('section'))
+    monkeypatch.setattr(VDOMDisplay, 'max_patch_operations', 1)
+    handle.update(bar(5))
+    assert comm.sent == []
+    assert displayed[1:] == [('update', VDOM('section')), ('update', bar(5))]
+
+
+def test_full_updates_past_the_display_budget(displayed, monkeypatch):
+    comm = FakeComm()
+    channel = PatchChannel(comm)
+    comm.receive({'content': {'data': {'ready': True}}})
+    monkeypatch.setattr(VDOM, 'display_max_nodes', 5)
+    handle = VDOMDisplay(bar(0), channel=channel)
+
+    # The frontend only has the part of a large tree within the budget
+    large = div([p(str(i)) for i in range(10)])
+    handle.update(large)
+    handle.update(div([p(str(i)) for i in range(9)]))
+    handle.update(bar(1))
+    assert comm.sent == []
+    assert [tree for _, tree in displayed[1:]] == [
+        large,
+        div([p(str(i)) for i in range(9)]),
+        bar(1),
+    ]
+
+    handle.update(bar(2))
+    assert len(comm.sent) == 1
+
+
+def test_handler_ids_scoped_by_display(displayed):
+    def clicker(count):
+        return div(button(str(count), onClick=lambda event: count))
+
+    def handler_id(tree):
+        return tree['children'][0]['eventHandlers']['onClick']['hash']
+
+    comm = FakeComm()
+    channel = PatchChannel(comm)
+    comm.receive({'content': {'data': {'ready': True}}})
+    first = VDOMDisplay(clicker(0), channel=channel)
+    second = VDOMDisplay(clicker(0), channel=channel)
+    first.update(clicker(1))
+    sent_id = comm.sent[0]['patch'][0]['value']['eventHandlers']['onClick']['hash']
+    assert vdom_display._handler_registry.get(sent_id)(None) == 1
+
+    with vdom_display._handler_registry.scope(first.display_id):
+        assert handler_id(clicker(2).to_dict()) == sent_id
+    with vdom_display._handler_registry.scope(second.display_id):
+        assert handler_id(clicker(2).to_dict()) != sent_id
+
+
+class FakeHandle(object):
+    def __init__(self, display_id):
+        self.display_id = display_id
+        self.sent = []
+        self.synced = 0
+
+    def send(self, tree):
+        self.sent.append(tree)
+
+    def sync(self):
+        self.synced += 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.001)
+
+
+def test_scheduler_coalesces_updates():
+    scheduler = UpdateScheduler(max_frequency=5)
+    first, second = FakeHandle('first'), FakeHandle('second')
+    scheduler.submit(first, 0)
+    wait_for(lambda: first.sent)
+
+    # The thread now waits before sending again, only the latest trees are kept
+    for i in range(1, 4):
+        scheduler.submit(first, i)
+        scheduler.submit(second, -i)
+    scheduler.flush()
+    assert first.sent == [0, 3]
+    assert second.sent == [-3]
+    assert first.synced == second.synced == 1
+
+    scheduler.flush()
+    assert first.synced == 1
+    scheduler.close()
+
+
+def test_scheduler_delivers_final_state():
+    scheduler = UpdateScheduler(max_frequency=100)
+    handle = FakeHandle('progress')
+    for i in range(1000):
+        scheduler.submit(handle, i)
+    wait_for(lambda: handle.sent and handle.sent[-1] == 999)
+    assert handle.sent == sorted(set(handle.sent))
+    scheduler.close()
+    assert handle.sent[-1] == 999
+
+
+def test_display_updates_through_scheduler(displayed):
+    scheduler = UpdateScheduler(max_frequency=1000)
+    handle = VDOMDisplay(bar(0), channel=None, scheduler=scheduler)
+    for i in range(1, 50):
+        handle.update(bar(i))
+    scheduler.close()
+    assert displayed[-1] == ('update', bar(49))
+    assert handle.tree == bar(49)
+    with pytest.raises(ValueError):
+        handle.update(bar(50))
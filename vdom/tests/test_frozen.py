@@ -1,3 +1,6 @@
+import copy
+import pickle
+
 import pytest
 
 from vdom.frozendict import FrozenDict
@@ -18,3 +21,33 @@ def test_frozen():
     f = FrozenDict(a=1)
     with pytest.raises(ValueError):
         f['b'] = 5
+
+
+def test_frozen_mutators():
+    f = FrozenDict(a=1)
+    for mutate in (
+        lambda: f.update(b=2),
+        lambda: f.setdefault('b', 2),
+        lambda: f.pop('a'),
+        lambda: f.popitem(),
+        lambda: f.clear(),
+    ):
+        with pytest.raises(ValueError):
+            mutate()
+    with pytest.raises(ValueError):
+        del f['a']
+    with pytest.raises(ValueError):
+        f |= {'b': 2}
+    assert f == {'a': 1}
+
+
+def test_empty_singleton():
+    assert FrozenDict() is FrozenDict()
+    assert FrozenDict() == {}
+
+
+def test_pickle_and_copy():
+    f = FrozenDict([('b', 2), ('a', 1)])
+    assert pickle.loads(pickle.dumps(f)) == f
+    assert type(copy.deepcopy(f)) is FrozenDict
+    assert list(copy.copy(f).items()) == [('b', 2), ('a', 1)]
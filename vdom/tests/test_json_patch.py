@@ -0,0 +1,158 @@
+import copy
+import json
+import random
+
+import pytest
+from jsonschema import ValidationError
+
+from .. import core
+from ..core import VDOM
+from ..helpers import b, button, div, li, p, span, ul
+from ..json_patch import apply_patch, make_patch
+
+
+def resolve(document, pointer):
+    """Parent container and last token of a JSON pointer, RFC 6901"""
+    tokens = [t.replace('~1', '/').replace('~0', '~') for t in pointer.split('/')[1:]]
+    for token in tokens[:-1]:
+        document = document[int(token) if isinstance(document, list) else token]
+    return document, tokens[-1]
+
+
+def apply_json_patch(document, patch):
+    """Straightforward RFC 6902 implementation for plain JSON documents"""
+    document = copy.deepcopy(document)
+    for op in patch:
+        if op['op'] == 'replace' and op['path'] == '':
+            document = copy.deepcopy(op['value'])
+            continue
+        if op['op'] == 'move':
+            parent, token = resolve(document, op['from'])
+            value = parent.pop(int(token) if isinstance(parent, list) else token)
+        elif op['op'] != 'remove':
+            value = copy.deepcopy(op['value'])
+        parent, token = resolve(document, op['path'])
+        if isinstance(parent, list):
+            index = len(parent) if token == '-' else int(token)
+            if op['op'] == 'remove':
+                del parent[index]
+            elif op['op'] == 'replace':
+                parent[index] = value
+            else:
+                parent.insert(index, value)
+        elif op['op'] == 'remove':
+            del parent[token]
+        else:
+            parent[token] = value
+    return document
+
+
+def check(old, new):
+    patch = make_patch(old, new)
+    json.dumps(patch)
+    assert apply_json_patch(old.to_dict(), patch) == new.to_dict()
+    assert apply_patch(old, patch) == new
+    return patch
+
+
+def test_patch_paths():
+    old = div(ul(li('a'), li('b')), p('text', title='x'), style={'color': 'red'})
+    new = div(ul(li('b'), li('c')), p('new text', **{'data~x/y': 'z'}))
+    assert check(old, new) == [
+        {'op': 'remove', 'path': '/attributes/style'},
+        {'op': 'add', 'path': '/children/1/attributes/data~0x~1y', 'value': 'z'},
+        {'op': 'remove', 'path': '/children/1/attributes/title'},
+        {'op': 'replace', 'path': '/children/1/children/0', 'value': 'new text'},
+        {'op': 'move', 'from': '/children/0/children/0', 'path': '/children/0/children/1'},
+        {'op': 'replace', 'path': '/children/0/children/1/children/0', 'value': 'c'},
+    ]
+
+
+def test_keyed_moves():
+    def rows(keys):
+        return ul([VDOM('li', key=k, children=[str(k)]) for k in keys])
+
+    assert check(rows([1, 2, 3, 4]), rows([4, 1, 2, 3])) == [
+        {'op': 'move', 'from': '/children/3', 'path': '/children/0'}
+    ]
+
+
+def test_event_handler_ids_match_full_documents():
+    def item(name):
+        return VDOM('li', children=[button(name, onClick=lambda event: name)], key=name)
+
+    old = div(ul(item('a'), item('b')))
+    new = div(ul(item('c'), item('b'), item('a')))
+    patch = make_patch(old, new)
+    assert apply_json_patch(old.to_dict(), patch) == new.to_dict()
+
+
+def test_event_handler_ids_of_shifted_elements():
+    def handler(name):
+        return lambda event: name
+
+    old = div(button('F', onClick=handler('F')))
+    new = div(button('G', onClick=handler('G')), old.children[0])
+    document = apply_json_patch(old.to_dict(), make_patch(old, new))
+    assert document == new.to_dict()
+    handler_id = document['children'][1]['eventHandlers']['onClick']['hash']
+    assert core._handler_registry.get(handler_id)(None) == 'F'
+
+
+def test_replaced_root():
+    assert check(div('a'), span('a')) == [
+        {'op': 'replace', 'path': '', 'value': span('a').to_dict()}
+    ]
+
+
+def test_apply_patch_shares_unchanged_subtrees():
+    rows = [li(str(i)) for i in range(50)]
+    old = div(ul(rows), p('footer', style={'color': 'red'}))
+    new = div(ul(rows[:10] + rows[11:]), p('footer', style={'color': 'blue'}))
+    patched = apply_patch(old, check(old, new))
+    assert all(a is b for a, b in zip(patched.children[0].children, rows[:10]))
+    assert all(a is b for a, b in zip(patched.children[0].children[10:], rows[11:]))
+
+
+def test_apply_other_operations():
+    old = div(p('a', style={'color': 'red'}), p('b'))
+    patch = [
+        {'op': 'test', 'path': '/children/1/children/0', 'value': 'b'},
+        {'op': 'add', 'path': '/children/-', 'value': 'tail'},
+        {'op': 'copy', 'from': '/children/0', 'path': '/children/1'},
+        {'op': 'add', 'path': '/children/0/attributes/style/fontSize', 'value': '2em'},
+        {'op': 'remove', 'path': '/children/1/attributes/style/color'},
+        {'op': 'move', 'from': '/children/3', 'path': '/children/0'},
+    ]
+    assert apply_patch(old, patch) == div(
+        'tail', p('a', style={'color': 'red', 'fontSize': '2em'}), p('a'), p('b')
+    )
+
+    with pytest.raises(ValueError):
+        apply_patch(old, [{'op': 'test', 'path': '/children/1/children/0', 'value': 'c'}])
+    with pytest.raises(ValueError):
+        apply_patch(old, [{'op': 'add', 'path': '/tagName', 'value': 'span'}])
+    with pytest.raises(ValidationError):
+        apply_patch(old, [{'op': 'add', 'path': '/children/0', 'value': {'tagName': 'p'}}])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_trees(seed):
+    rng = random.Random(seed)
+
+    def tree(depth):
+        children = []
+        for _ in range(rng.randint(0, 5)):
+            kind = rng.random()
+            if kind < 0.3 or depth == 0:
+                children.append(rng.choice(['a', 'b', 'c']))
+            elif kind < 0.6:
+                children.append(VDOM('li', key=rng.randint(1, 6), children=[tree(depth - 1)]))
+            else:
+                tag = rng.choice([div, p, span, b])
+                style = rng.choice([None, {'color': 'red'}, {'color': 'blue', 'margin': '0'}])
+                children.append(tag(tree(depth - 1), title=rng.choice(['x', 'y']), style=style))
+        return div(children)
+
+    for _ in range(10):
+        check(tree(3), tree(3))
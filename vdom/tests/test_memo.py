@@ -0,0 +1,62 @@
+from ..helpers import div, p
+from ..memo import memo
+
+
+def test_returns_cached_tree():
+    calls = []
+
+    @memo
+    def widget(title, value=0):
+        calls.append(title)
+        return div(p(title), p(str(value)))
+
+    assert widget('a', value=1) is widget('a', value=1)
+    assert widget('a', value=1) is not widget('a', value=2)
+    assert widget('b') == div(p('b'), p('0'))
+    assert calls == ['a', 'a', 'b']
+    assert widget.cache_info() == (2, 3, 128, 3)
+    assert widget.__name__ == 'widget'
+
+
+def test_arguments_are_typed():
+    @memo
+    def label(value):
+        return p(str(value))
+
+    assert label(1) is not label(True)
+    assert label(True).children == ('True',)
+
+
+def test_vdom_arguments_compare_structurally():
+    @memo
+    def card(body):
+        return div(body)
+
+    assert card(p('x')) is card(p('x'))
+
+
+def test_lru_eviction():
+    @memo(maxsize=2)
+    def widget(title):
+        return p(title)
+
+    first = widget('a')
+    widget('b')
+    assert widget('a') is first
+    widget('c')  # evicts 'b', the least recently used
+    assert widget('a') is first
+    assert widget.cache_info().currsize == 2
+    misses = widget.cache_info().misses
+    widget('b')
+    assert widget.cache_info().misses == misses + 1
+
+
+def test_unhashable_arguments_pass_through():
+    @memo
+    def listing(items):
+        return div([p(item) for item in items])
+
+    assert listing(['a']) is not listing(['a'])
+    assert listing.cache_info().currsize == 0
+    listing.cache_clear()
+    assert listing.cache_info() == (0, 0, 128, 0)
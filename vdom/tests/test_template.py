@@ -0,0 +1,87 @@
+import pytest
+from IPython.core.formatters import DisplayFormatter
+
+from ..core import VDOM
+from ..helpers import b, div, input_, meter, p, span
+from ..template import template
+
+
+@template
+def happiness(level, smiley, note='none'):
+    return span(
+        p('Happiness ', smiley, title='{}%'.format(level)),
+        meter(level, min=0, low=25, high=75, optimum=90, max=100, value=level),
+        b('static', data_note=note),
+        p('Unchanged'),
+        style={'width': '{}px'.format(level), 'color': smiley},
+    )
+
+
+def happiness_direct(level, smiley, note='none'):
+    return span(
+        p('Happiness ', str(smiley), title='{}%'.format(level)),
+        meter(str(level), min=0, low=25, high=75, optimum=90, max=100, value=level),
+        b('static', data_note=note),
+        p('Unchanged'),
+        style={'width': '{}px'.format(level), 'color': str(smiley)},
+    )
+
+
+@pytest.mark.parametrize(
+    'args', [(96, '😃'), (10, '<☹️>', 'a "quoted" note'), ('50', '&'), (True, 'x', False)]
+)
+def test_matches_direct_rendering(args):
+    rendered = happiness(*args)
+    expected = happiness_direct(*args)
+    assert rendered.to_json() == expected.to_json()
+    assert rendered.to_dict() == expected.to_dict()
+    assert rendered.to_html() == expected.to_html()
+    assert rendered.to_vdom() == expected
+
+
+def test_static_subtrees_are_shared():
+    first = happiness(1, 'a').to_vdom()
+    second = happiness(2, 'b').to_vdom()
+    assert first.children[3] is second.children[3]
+    assert first.children[0] != second.children[0]
+
+
+def test_keyword_arguments_and_defaults():
+    assert happiness(smiley='x', level=3).to_html() == happiness(3, 'x', 'none').to_html()
+    with pytest.raises(TypeError):
+        happiness(1)
+
+
+def test_rejects_elements_as_values():
+    with pytest.raises(TypeError):
+        happiness(1, b('no'))
+
+
+def test_rejects_variadic_components():
+    with pytest.raises(ValueError):
+        template(lambda *children: div(*children))
+
+
+def test_component_must_return_vdom():
+    with pytest.raises(TypeError):
+        template(lambda name: name)
+
+
+def test_boolean_attribute_holes():
+    checkbox = template(lambda checked: input_(checked=checked))
+    assert checkbox(True).to_html() == '<input checked></input>'
+    assert checkbox(False).to_html() == '<input></input>'
+    assert checkbox(False).to_dict()['attributes'] == {'checked': False}
+    assert checkbox(True).to_vdom() == VDOM('input', {'checked': True})
+
+
+def test_repr_mimebundle():
+    greeting = template(lambda name: p('Hello ', name))
+    bundle = greeting('world')._repr_mimebundle_()
+    assert bundle == {
+        'application/vdom.v1+json': greeting('world').to_dict(),
+        'text/plain': '<p>Hello world</p>',
+    }
+    assert set(greeting('world')._repr_mimebundle_(include=['text/html'])) == {'text/html'}
+    data, _ = DisplayFormatter().format(greeting('world'))
+    assert set(data) == {'application/vdom.v1+json', 'text/plain'}